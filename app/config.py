@@ -0,0 +1,103 @@
+"""
+Application Settings
+
+Reads the environment once at import and exposes it as an immutable Settings object.
+Modules reference the shared instance via get_settings() instead of calling os.getenv.
+"""
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+def _env_flag(name: str, default: str = "false") -> bool:
+    """Parse a "true"/"false" environment variable."""
+    return os.getenv(name, default).lower() == "true"
+
+
+def _env_list(name: str, default: str = "") -> Tuple[str, ...]:
+    """Parse a comma-separated environment variable into a tuple of non-empty values."""
+    return tuple(item.strip() for item in os.getenv(name, default).split(",") if item.strip())
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Process-wide configuration derived from environment variables."""
+
+    # Deployment / transport security
+    environment: str
+    require_tls: bool
+    enforce_https: bool
+    hsts_max_age: int
+    hsts_include_subdomains: bool
+    hsts_preload: bool
+    allowed_hosts: Tuple[str, ...]
+    allowed_origins: Tuple[str, ...]
+
+    # Authentication
+    require_auth: bool
+    jwt_secret_key: str
+    auth0_domain: Optional[str]
+    auth0_audience: Optional[str]
+    auth0_enabled: bool
+    auth0_issuer: str
+    auth0_jwks_url: str
+
+    # Authorization
+    enable_data_access_control: bool
+
+    # LLM
+    llm_max_concurrency: int
+
+    @property
+    def is_production(self) -> bool:
+        return self.environment == "production"
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        Build settings from the current environment.
+
+        Returns:
+            Settings instance
+        """
+        environment = os.getenv("ENVIRONMENT", "development")
+        is_production = environment == "production"
+        auth0_domain = os.getenv("AUTH0_DOMAIN")
+        auth0_audience = os.getenv("AUTH0_AUDIENCE")
+
+        return cls(
+            environment=environment,
+            require_tls=_env_flag("REQUIRE_TLS") or is_production,
+            enforce_https=_env_flag("ENFORCE_HTTPS") or is_production,
+            hsts_max_age=int(os.getenv("HSTS_MAX_AGE", "31536000")),  # 1 year in seconds
+            hsts_include_subdomains=_env_flag("HSTS_INCLUDE_SUBDOMAINS", "true"),
+            hsts_preload=_env_flag("HSTS_PRELOAD"),
+            allowed_hosts=_env_list("ALLOWED_HOSTS"),
+            allowed_origins=_env_list(
+                "ALLOWED_ORIGINS",
+                "http://localhost:3000,http://localhost:8000"  # Default for development
+            ),
+            # For development: allow unauthenticated access if ENABLE_AUTH is not set
+            require_auth=_env_flag("ENABLE_AUTH"),
+            jwt_secret_key=os.getenv("JWT_SECRET_KEY", "CHANGE_THIS_IN_PRODUCTION_USE_COMPLEX_SECRET"),
+            auth0_domain=auth0_domain,
+            auth0_audience=auth0_audience,
+            auth0_enabled=bool(auth0_domain and auth0_audience),
+            auth0_issuer=f"https://{auth0_domain}/",
+            auth0_jwks_url=f"https://{auth0_domain}/.well-known/jwks.json",
+            # Feature flag - can be disabled for testing
+            enable_data_access_control=_env_flag("ENABLE_DATA_ACCESS_CONTROL"),
+            # Cap on concurrent LLM calls per worker (0 = unbounded)
+            llm_max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "0")),
+        )
+
+
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    """Return the process-wide Settings singleton."""
+    global _settings
+    if _settings is None:
+        _settings = Settings.from_env()
+    return _settings
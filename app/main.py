@@ -3,24 +3,24 @@ Master Agent FastAPI Application
 
 Main entry point for the Master Agent service.
 """
-import os
+import asyncio
 import logging
-from fastapi import FastAPI, HTTPException, Request, Response, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi.responses import ORJSONResponse, HTMLResponse
 from slowapi.errors import RateLimitExceeded
+from cachetools import TTLCache
 
+from .config import get_settings
 from .models.query_models import AskRequest, AskResponse, HealthResponse, SecurityHealthResponse
-from .routers import agent, query, prompt_eval, test, chat
-from .routers import debug as debug_router
-from .services.data_router import DataRouter
-from .services.llm_engine import LLMEngine
+from .routers import agent, query, prompt_eval, chat
 from .middleware.rate_limit import limiter, _rate_limit_exceeded_handler
 from .middleware.auth import verify_token
 from .middleware.auth import require_admin
 from .middleware.security_headers import SecurityHeadersMiddleware, TLSEnforcementMiddleware
 from .middleware.fail_safe import FailSafeMiddleware
+from .middleware.cors import FastPathCORSMiddleware
 from .services.security import SecurityError, InputSanitizer
+from .services.database import invalidate_access_cache
 
 # Configure logging
 logging.basicConfig(
@@ -37,7 +37,8 @@ app = FastAPI(
     title="Master Agent API",
     description="Master Agent service for Tilli - routes educator questions to assessment data and generates insights",
     version="0.1.0",
-    lifespan=lifespan  # Handles startup/shutdown with fail-safe behavior
+    lifespan=lifespan,  # Handles startup/shutdown with fail-safe behavior
+    default_response_class=ORJSONResponse  # orjson serialization for all JSON responses
 )
 
 
@@ -46,17 +47,8 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-# TLS/HTTPS Configuration
-ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
-REQUIRE_TLS = os.getenv("REQUIRE_TLS", "false").lower() == "true" or ENVIRONMENT == "production"
-ENFORCE_HTTPS = os.getenv("ENFORCE_HTTPS", "false").lower() == "true" or ENVIRONMENT == "production"
-HSTS_MAX_AGE = int(os.getenv("HSTS_MAX_AGE", "31536000"))  # 1 year in seconds
-HSTS_INCLUDE_SUBDOMAINS = os.getenv("HSTS_INCLUDE_SUBDOMAINS", "true").lower() == "true"
-HSTS_PRELOAD = os.getenv("HSTS_PRELOAD", "false").lower() == "true"
-
-# Allowed hosts for Host header validation
-ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "").split(",")
-ALLOWED_HOSTS = [h.strip() for h in ALLOWED_HOSTS if h.strip()]
+# TLS/HTTPS and CORS configuration (read once from the environment, see app/config.py)
+settings = get_settings()
 
 # Add fail-safe middleware (should be early in middleware stack)
 # This ensures requests are rejected when service is stopping (fail-safe behavior)
@@ -64,32 +56,29 @@ app.add_middleware(FailSafeMiddleware)
 logger.info("Fail-safe middleware enabled (rejects requests when service is stopping)")
 
 # Add TLS enforcement middleware (should be before fail-safe for HTTPS check)
-if REQUIRE_TLS:
+if settings.require_tls:
     logger.info("TLS enforcement enabled")
     app.add_middleware(
         TLSEnforcementMiddleware,
-        require_tls=REQUIRE_TLS,
-        allowed_hosts=ALLOWED_HOSTS if ALLOWED_HOSTS else None
+        require_tls=settings.require_tls,
+        allowed_hosts=list(settings.allowed_hosts) if settings.allowed_hosts else None
     )
 
 # Add security headers middleware
-logger.info(f"Security headers enabled: HTTPS enforcement={ENFORCE_HTTPS}, HSTS max-age={HSTS_MAX_AGE}")
+logger.info("Security headers enabled: HTTPS enforcement=%s, HSTS max-age=%s", settings.enforce_https, settings.hsts_max_age)
 app.add_middleware(
     SecurityHeadersMiddleware,
-    enforce_https=ENFORCE_HTTPS,
-    hsts_max_age=HSTS_MAX_AGE,
-    hsts_include_subdomains=HSTS_INCLUDE_SUBDOMAINS,
-    hsts_preload=HSTS_PRELOAD,
+    enforce_https=settings.enforce_https,
+    hsts_max_age=settings.hsts_max_age,
+    hsts_include_subdomains=settings.hsts_include_subdomains,
+    hsts_preload=settings.hsts_preload,
 )
 
 # Configure CORS with security defaults
-allowed_origins = os.getenv(
-    "ALLOWED_ORIGINS",
-    "http://localhost:3000,http://localhost:8000"  # Default for development
-).split(",")
+allowed_origins = list(settings.allowed_origins)
 
 # In production, restrict to specific origins
-if os.getenv("ENVIRONMENT", "development") == "production":
+if settings.is_production:
     if "*" in allowed_origins:
         logger.warning("CORS allows all origins in production! Restricting to whitelist.")
         allowed_origins = [
@@ -98,7 +87,7 @@ if os.getenv("ENVIRONMENT", "development") == "production":
         ]
 
 app.add_middleware(
-    CORSMiddleware,
+    FastPathCORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
     allow_methods=["GET", "POST"],  # Only allow needed methods
@@ -106,17 +95,33 @@ app.add_middleware(
     max_age=3600,
 )
 
-# Initialize services
-data_router = DataRouter()
-llm_engine = LLMEngine()
+# Shared services (DataRouter, LLMEngine, SecurityHealthCheck) are created at startup
+# by the lifespan handler and live on app.state; routers reach them through the
+# get_data_router / get_llm_engine dependencies instead of building their own.
+
+# Reuse the security health check result for a few seconds
+_health_status_cache: TTLCache = TTLCache(maxsize=1, ttl=5)
+
+
+def _get_health_status(health_checker) -> dict:
+    """Return the security health status, re-running the checks at most every 5 seconds."""
+    health_status = _health_status_cache.get("status")
+    if health_status is None:
+        health_status = health_checker.check_all()
+        _health_status_cache["status"] = health_status
+    return health_status
 
 # Include routers
 app.include_router(agent.router)
 app.include_router(query.router)
 app.include_router(prompt_eval.router)
-app.include_router(test.router)
 app.include_router(chat.router)
-app.include_router(debug_router.router)
+
+# Test/debug endpoints are not exposed (or imported) in production
+if not settings.is_production:
+    from .routers import test, debug as debug_router
+    app.include_router(test.router)
+    app.include_router(debug_router.router)
 
 
 @app.post("/ask", response_model=AskResponse, tags=["ask"])
@@ -143,31 +148,30 @@ async def ask(
     try:
         # Step 0: Sanitize and validate all inputs
         try:
-            sanitized_question = InputSanitizer.sanitize_question(ask_request.question)
-            sanitized_student_id = InputSanitizer.sanitize_identifier(
-                ask_request.student_id, 
-                field_name="student_id"
-            )
-            sanitized_classroom_id = InputSanitizer.sanitize_identifier(
-                ask_request.classroom_id,
-                field_name="classroom_id"
-            )
-            sanitized_grade_level = InputSanitizer.sanitize_grade_level(ask_request.grade_level)
+            (
+                sanitized_question,
+                sanitized_student_id,
+                sanitized_classroom_id,
+                sanitized_grade_level
+            ) = InputSanitizer.sanitize_ask_request(ask_request)
         except SecurityError as e:
-            logger.warning(f"Security violation: {str(e)}")
+            logger.warning("Security violation: %s", e)
             raise HTTPException(status_code=400, detail=str(e))
         
         # Log request for audit trail
         logger.info(
-            f"Request from user {current_user.get('user_id', 'unknown')}: "
-            f"question_length={len(sanitized_question)}"
+            "Request from user %s: question_length=%d",
+            current_user.get('user_id', 'unknown'), len(sanitized_question)
         )
         
+        data_router = request.app.state.data_router
+        llm_engine = request.app.state.llm_engine
+        
         # Step 1: Determine which data sources are needed
         data_sources = data_router.determine_data_sources(sanitized_question)
         
-        # Step 2: Fetch data from relevant sources
-        dataset = data_router.fetch_data(
+        # Step 2: Fetch data from relevant sources (off the event loop)
+        dataset = await data_router.afetch_data(
             data_sources=data_sources,
             grade_level=sanitized_grade_level,
             student_id=sanitized_student_id,
@@ -178,15 +182,13 @@ async def ask(
         data_summary = data_router.format_data_for_llm(dataset)
         
         # Step 4: Generate response using LLM
-        answer = llm_engine.generate_response(
+        answer = await llm_engine.agenerate_response(
             question=sanitized_question,
             data_summary=data_summary
         )
         
         # Step 5: Determine confidence
-        confidence = "high" if len(data_sources) >= 2 else "medium"
-        if not data_sources:
-            confidence = "low"
+        confidence = agent.CONFIDENCE_LEVELS[min(len(data_sources), 2)]
         
         return AskResponse(
             answer=answer,
@@ -195,7 +197,7 @@ async def ask(
         )
     
     except SecurityError as e:
-        logger.warning(f"Security error: {str(e)}")
+        logger.warning("Security error: %s", e)
         raise HTTPException(
             status_code=400,
             detail="Invalid input detected. Please check your request."
@@ -204,7 +206,7 @@ async def ask(
         raise
     except Exception as e:
         # Log full error internally but don't expose details to client
-        logger.error(f"Error processing question: {str(e)}", exc_info=True)
+        logger.error("Error processing question: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail="An error occurred processing your question. Please try again later."
@@ -245,6 +247,55 @@ async def health_check(request: Request) -> HealthResponse:
     )
 
 
+# Static presentation data for the /health/security summary and HTML formats
+_EMOJI = {"healthy": "✅", "degraded": "⚠️", "unhealthy": "❌", "critical": "🔴"}
+_PRIO = {"critical": 0, "unhealthy": 1, "degraded": 2, "healthy": 3}
+_STATUS_COLOR = {"healthy": "#2e7d32", "degraded": "#f57f17", "unhealthy": "#c62828", "critical": "#b71c1c"}
+_SUGGESTIONS = {
+    "authentication": ["Enable auth in prod: ENABLE_AUTH=true, set JWT_SECRET_KEY"],
+    "transport_security": ["Enforce TLS: REQUIRE_TLS=true and reverse proxy TLS"],
+    "external_api": ["Set GEMINI_API_KEY to enable real LLM calls"],
+    "security_headers": ["Enable ENFORCE_HTTPS=true; verify CSP/HSTS in prod"],
+    "cors": ["Restrict ALLOWED_ORIGINS to trusted domains"],
+    "rate_limiting": ["Back with Redis for multi-instance deployments"],
+    "audit_logging": ["Ensure immutable storage and FERPA retention"],
+    "harmful_content_detection": ["Tune sensitivity/block threshold before prod"],
+}
+_DOCS_LINKS = {
+    "readme": "README.md",
+    "tls": "TLS_CONFIGURATION.md",
+    "security": "SECURITY.md",
+    "health": "HEALTH_CHECK.md",
+}
+_BADGE_TEMPLATE = "<span style='background:{color};color:#fff;padding:2px 8px;border-radius:12px;font-size:12px'>{text}</span>"
+_HTML_ROW_TEMPLATE = "<tr><td>{check}</td><td>{badge}</td><td>{message}</td><td>{suggestions}</td></tr>"
+_HTML_NO_ISSUES_ROW = '<tr><td colspan="4">No issues</td></tr>'
+_HTML_TEMPLATE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Security Health</title>
+<style>body{{font-family:-apple-system,Segoe UI,Roboto,Helvetica,Arial,sans-serif;padding:20px}}table{{border-collapse:collapse;width:100%}}th,td{{border:1px solid #e0e0e0;padding:8px;text-align:left}}th{{background:#fafafa}}.counts span{{margin-right:10px}}</style>
+</head><body>
+  <h2>Security Health {emoji}</h2>
+  <div class="counts">
+    {badge}
+    <span>Healthy: {healthy}</span>
+    <span>Degraded: {degraded}</span>
+    <span>Unhealthy: {unhealthy}</span>
+    <span>Critical: {critical}</span>
+  </div>
+  <h3>Top Issues</h3>
+  <table>
+    <tr><th>Check</th><th>Status</th><th>Message</th><th>Suggestions</th></tr>
+    {rows}
+  </table>
+  <p style="margin-top:16px">Docs: <a href="README.md">README</a> · <a href="TLS_CONFIGURATION.md">TLS</a> · <a href="SECURITY.md">Security</a> · <a href="HEALTH_CHECK.md">Health Check</a></p>
+</body></html>"""
+
+
+def _badge(status: str) -> str:
+    """Render a colored status pill for the HTML health report."""
+    return _BADGE_TEMPLATE.format(color=_STATUS_COLOR.get(status, "#616161"), text=status)
+
+
 @app.get("/health/security", response_model=SecurityHealthResponse, tags=["health"])
 @limiter.limit("10/minute")  # Lower rate limit for security endpoint
 async def security_health_check(
@@ -290,99 +341,94 @@ async def security_health_check(
         }
         ```
     """
-    from .services.security_health_check import SecurityHealthCheck
-    
-    health_checker = SecurityHealthCheck()
-    health_status = health_checker.check_all()
+    health_status = _get_health_status(request.app.state.health_checker)
     
     # Optional friendly formats
     fmt = (request.query_params.get("format") or "").lower()
     if fmt in ("summary", "html"):
-        def _emoji(s: str) -> str:
-            return {"healthy":"✅","degraded":"⚠️","unhealthy":"❌","critical":"🔴"}.get(s, "❓")
-        def _prio(s: str) -> int:
-            return {"critical":0,"unhealthy":1,"degraded":2,"healthy":3}.get((s or "").lower(), 9)
-        def _suggestions(name: str) -> list[str]:
-            m = {
-                "authentication": ["Enable auth in prod: ENABLE_AUTH=true, set JWT_SECRET_KEY"],
-                "transport_security": ["Enforce TLS: REQUIRE_TLS=true and reverse proxy TLS"],
-                "external_api": ["Set GEMINI_API_KEY to enable real LLM calls"],
-                "security_headers": ["Enable ENFORCE_HTTPS=true; verify CSP/HSTS in prod"],
-                "cors": ["Restrict ALLOWED_ORIGINS to trusted domains"],
-                "rate_limiting": ["Back with Redis for multi-instance deployments"],
-                "audit_logging": ["Ensure immutable storage and FERPA retention"],
-                "harmful_content_detection": ["Tune sensitivity/block threshold before prod"],
-            }
-            return m.get(name, [])
-        checks = health_status.get("checks", {})
         flat = []
-        for name, d in checks.items():
-            st = (d.get("status") or "healthy").lower()
+        for name, d in health_status.get("checks", {}).items():
             flat.append({
                 "check": name,
-                "status": st,
+                "status": (d.get("status") or "healthy").lower(),
                 "message": d.get("message"),
-                "suggestions": _suggestions(name),
+                "suggestions": _SUGGESTIONS.get(name, []),
             })
-        flat.sort(key=lambda x: _prio(x["status"]))
+        flat.sort(key=lambda x: _PRIO.get(x["status"], 9))
+        overall_status = health_status.get("overall_status")
+        counts = health_status.get("summary", {})
         summary = {
             "timestamp": health_status.get("timestamp"),
-            "overall_status": f"{_emoji(health_status.get('overall_status'))} {health_status.get('overall_status')}",
+            "overall_status": f"{_EMOJI.get(overall_status, '❓')} {overall_status}",
             "counts": {
-                "healthy": health_status.get("summary", {}).get("healthy"),
-                "degraded": health_status.get("summary", {}).get("degraded"),
-                "unhealthy": health_status.get("summary", {}).get("unhealthy"),
-                "critical": health_status.get("summary", {}).get("critical"),
+                "healthy": counts.get("healthy"),
+                "degraded": counts.get("degraded"),
+                "unhealthy": counts.get("unhealthy"),
+                "critical": counts.get("critical"),
             },
             "top_issues": [i for i in flat if i["status"] != "healthy"][:3],
             "checks": flat if fmt == "summary" else None,
-            "docs_links": {
-                "readme": "README.md",
-                "tls": "TLS_CONFIGURATION.md",
-                "security": "SECURITY.md",
-                "health": "HEALTH_CHECK.md",
-            }
+            "docs_links": _DOCS_LINKS,
         }
         if fmt == "html":
-            def badge(color: str, text: str) -> str:
-                return f"<span style='background:{color};color:#fff;padding:2px 8px;border-radius:12px;font-size:12px'>{text}</span>"
-            status_color = {
-                "healthy":"#2e7d32","degraded":"#f57f17","unhealthy":"#c62828","critical":"#b71c1c"
-            }.get(health_status.get("overall_status"), "#616161")
-            rows = []
-            for i in summary["top_issues"]:
-                color = {"healthy":"#2e7d32","degraded":"#f57f17","unhealthy":"#c62828","critical":"#b71c1c"}.get(i["status"],"#616161")
-                rows.append(f"<tr><td>{i['check']}</td><td>{badge(color, i['status'])}</td><td>{i.get('message','')}</td><td>{'; '.join(i.get('suggestions', []))}</td></tr>")
-            html = f"""<!doctype html>
-<html><head><meta charset="utf-8"><title>Security Health</title>
-<style>body{{font-family:-apple-system,Segoe UI,Roboto,Helvetica,Arial,sans-serif;padding:20px}}table{{border-collapse:collapse;width:100%}}th,td{{border:1px solid #e0e0e0;padding:8px;text-align:left}}th{{background:#fafafa}}.counts span{{margin-right:10px}}</style>
-</head><body>
-  <h2>Security Health {_emoji(health_status.get('overall_status'))}</h2>
-  <div class="counts">
-    {badge(status_color, health_status.get('overall_status'))}
-    <span>Healthy: {summary['counts']['healthy']}</span>
-    <span>Degraded: {summary['counts']['degraded']}</span>
-    <span>Unhealthy: {summary['counts']['unhealthy']}</span>
-    <span>Critical: {summary['counts']['critical']}</span>
-  </div>
-  <h3>Top Issues</h3>
-  <table>
-    <tr><th>Check</th><th>Status</th><th>Message</th><th>Suggestions</th></tr>
-    {''.join(rows) or '<tr><td colspan="4">No issues</td></tr>'}
-  </table>
-  <p style="margin-top:16px">Docs: <a href="README.md">README</a> · <a href="TLS_CONFIGURATION.md">TLS</a> · <a href="SECURITY.md">Security</a> · <a href="HEALTH_CHECK.md">Health Check</a></p>
-</body></html>"""
+            rows_html = "".join(
+                _HTML_ROW_TEMPLATE.format(
+                    check=i["check"],
+                    badge=_badge(i["status"]),
+                    message=i.get("message", ""),
+                    suggestions="; ".join(i.get("suggestions", [])),
+                )
+                for i in summary["top_issues"]
+            )
+            html = _HTML_TEMPLATE.format_map({
+                "emoji": _EMOJI.get(overall_status, "❓"),
+                "badge": _badge(overall_status),
+                "rows": rows_html or _HTML_NO_ISSUES_ROW,
+                **summary["counts"],
+            })
             return HTMLResponse(content=html, status_code=200)
-        return JSONResponse(content=summary, status_code=200)
+        return ORJSONResponse(content=summary, status_code=200)
     
     # Default: full JSON (pydantic model) with status code mapping
     response = SecurityHealthResponse(**health_status)
     if health_status["overall_status"] in ("critical", "unhealthy"):
-        return Response(content=response.model_dump_json(), status_code=503, media_type="application/json")
+        return ORJSONResponse(content=response.model_dump(), status_code=503)
     return response
 
 
+@app.post("/admin/cache/invalidate", tags=["admin"])
+@limiter.limit("10/minute")
+async def invalidate_cache(
+    request: Request,
+    current_user: dict = Depends(require_admin)
+):
+    """
+    Invalidate cached classroom/roster lookups in every worker.
+    
+    Roster writes through the database already invalidate the cache; use this after
+    changes made around it (e.g. restoring the database file).
+    
+    Returns:
+        Number of cache entries removed from the worker that handled the request
+        (other workers drop theirs within ROSTER_VERSION_CHECK_SECONDS)
+    """
+    removed = await asyncio.to_thread(invalidate_access_cache)
+    logger.info("Access cache invalidated by %s", current_user.get('user_id', 'unknown'))
+    return {"status": "ok", "entries_removed": removed}
+
+
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # "auto" resolves to uvloop/httptools when installed (Linux/macOS) and falls back to
+    # asyncio/h11 elsewhere. An import string is required for workers > 1.
+    # Production runs under gunicorn with UvicornWorker (see SERVICE_MANAGEMENT.md).
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",
+        http="auto",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1"))
+    )
 
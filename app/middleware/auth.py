@@ -4,28 +4,34 @@ Authentication Middleware
 Provides authentication and authorization for the Master Agent API.
 Currently implements basic token-based authentication with JWT support.
 """
-import os
+import json
+import time
+import asyncio
 import logging
-from typing import Optional
-from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
+from datetime import timedelta
 from fastapi import HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt
+import jwt
+from jwt.algorithms import RSAAlgorithm
 from functools import wraps
+import httpx
+import xxhash
+from cachetools import TTLCache
+
+from ..config import get_settings
 
 logger = logging.getLogger(__name__)
 
 # Security scheme
 security = HTTPBearer(auto_error=False)
 
-# Configuration (should come from environment variables)
-SECRET_KEY = os.getenv("JWT_SECRET_KEY", "CHANGE_THIS_IN_PRODUCTION_USE_COMPLEX_SECRET")
+# Configuration (read once from environment variables, see app/config.py)
+settings = get_settings()
 ALGORITHM = "HS256"
+_LOCAL_ALGORITHMS = (ALGORITHM,)
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
-# For development: allow unauthenticated access if ENABLE_AUTH is not set
-REQUIRE_AUTH = os.getenv("ENABLE_AUTH", "false").lower() == "true"
-
 
 class AuthenticationError(HTTPException):
     """Exception raised for authentication errors."""
@@ -44,50 +50,134 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         Encoded JWT token
     """
     to_encode = data.copy()
+    # JWT exp is integer seconds since the epoch; no datetime objects needed
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = int(time.time()) + int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = int(time.time()) + ACCESS_TOKEN_EXPIRE_MINUTES * 60
     
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode["exp"] = expire
+    encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-# Auth0 Configuration
-AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
-AUTH0_AUDIENCE = os.getenv("AUTH0_AUDIENCE")
+# Auth0 Configuration (domain/audience/issuer come from settings)
 AUTH0_ALGORITHMS = ["RS256"]
+_ALGORITHMS_TUPLE = tuple(AUTH0_ALGORITHMS)
+
+# Process-wide JWKS cache: Auth0 public key objects indexed by "kid" (1h TTL).
+# Refreshed only on a cache miss; an unknown kid forces one refresh to pick up key rotation.
+JWKS_CACHE_TTL_SECONDS = 3600
+JWKS_MIN_REFRESH_INTERVAL_SECONDS = 60  # Avoid refetch storms from tokens with bogus kids
+_jwks_cache: TTLCache = TTLCache(maxsize=16, ttl=JWKS_CACHE_TTL_SECONDS)
+_jwks_lock = asyncio.Lock()
+_jwks_refreshed_at: Optional[float] = None
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client used for JWKS fetches."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=2.0)
+    return _http_client
+
+
+async def _fetch_jwks() -> List[Dict[str, Any]]:
+    """Download the Auth0 JSON Web Key Set."""
+    response = await _get_http_client().get(settings.auth0_jwks_url)
+    response.raise_for_status()
+    return response.json()["keys"]
+
+
+async def _get_jwks(kid: str) -> Optional[Any]:
+    """
+    Return the signing key for a kid, refreshing the JWKS cache on a miss.
+    
+    Args:
+        kid: Key ID from the token header
+        
+    Returns:
+        RSA public key object, or None if Auth0 does not publish the kid
+    """
+    rsa_key = _jwks_cache.get(kid)
+    if rsa_key is not None:
+        return rsa_key
+    
+    global _jwks_refreshed_at
+    async with _jwks_lock:
+        # Another request may have refreshed the cache while we waited for the lock
+        rsa_key = _jwks_cache.get(kid)
+        if rsa_key is not None:
+            return rsa_key
+        
+        now = time.monotonic()
+        recently_refreshed = (
+            _jwks_refreshed_at is not None
+            and now - _jwks_refreshed_at < JWKS_MIN_REFRESH_INTERVAL_SECONDS
+            and len(_jwks_cache) > 0
+        )
+        if recently_refreshed:
+            return None
+        
+        keys = await _fetch_jwks()
+        _jwks_cache.clear()
+        for key in keys:
+            # Build the RSAPublicKey once per kid so jwt.decode skips JWK parsing
+            _jwks_cache[key["kid"]] = RSAAlgorithm.from_jwk(json.dumps({
+                "kty": key["kty"],
+                "kid": key["kid"],
+                "use": key["use"],
+                "n": key["n"],
+                "e": key["e"]
+            }))
+        _jwks_refreshed_at = now
+        return _jwks_cache.get(kid)
 
-def get_auth0_public_key(token):
-    """Fetch JWKS and find the matching key for the token header."""
+
+async def get_auth0_public_key(token):
+    """Find the cached JWKS key matching the token header (fetching JWKS on a miss)."""
     try:
-        jwks_url = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json"
-        import requests
-        jwks = requests.get(jwks_url).json()
         unverified_header = jwt.get_unverified_header(token)
-        rsa_key = {}
-        for key in jwks["keys"]:
-            if key["kid"] == unverified_header["kid"]:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"]
-                }
-                return rsa_key
+        return await _get_jwks(unverified_header["kid"])
     except Exception as e:
-        logger.error(f"Error fetching Auth0 keys: {e}")
+        logger.error("Error fetching Auth0 keys: %s", e)
         raise HTTPException(status_code=500, detail="Could not verify token signature.")
+
+# Short-lived cache of verified tokens so bursts from one client skip signature checks.
+# Keyed by the 64-bit xxh3 hash of the raw token; entries store the full token, which is
+# compared on every hit so a hash collision can never return another user's identity.
+# Tokens expiring within the TTL are never cached.
+VERIFIED_TOKEN_CACHE_TTL_SECONDS = 30
+_verified_token_cache: TTLCache = TTLCache(maxsize=10000, ttl=VERIFIED_TOKEN_CACHE_TTL_SECONDS)
+
+
+def _token_cache_key(token: str) -> int:
+    """Return the verified-token cache key for a raw JWT."""
+    return xxhash.xxh3_64_intdigest(token.encode())
+
+
+def _get_verified_token(cache_key: int, token: str) -> Optional[Dict[str, Any]]:
+    """Return the cached user for a token, or None on a miss or hash collision."""
+    entry = _verified_token_cache.get(cache_key)
+    if entry is not None and entry[0] == token:
+        return entry[1]
     return None
 
-def verify_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> dict:
+
+def _remember_verified_token(cache_key: int, token: str, payload: Dict[str, Any], user: Dict[str, Any]) -> None:
+    """Cache a verified user unless the token expires before the cache entry would."""
+    exp = payload.get("exp")
+    if exp is not None and exp >= time.time() + VERIFIED_TOKEN_CACHE_TTL_SECONDS:
+        _verified_token_cache[cache_key] = (token, user)
+
+
+async def verify_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> dict:
     """
     Verify JWT token from request (supports Auth0 and local dev).
     """
     # If authentication is not required, allow unauthenticated access
-    if not REQUIRE_AUTH:
+    if not settings.require_auth:
         return {"user_id": "dev_user", "role": "educator", "school_id": "School 1", "authenticated": False}
     
     if credentials is None:
@@ -99,17 +189,22 @@ def verify_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(s
     
     token = credentials.credentials
     
+    cache_key = _token_cache_key(token)
+    cached_user = _get_verified_token(cache_key, token)
+    if cached_user is not None:
+        return cached_user
+    
     # Mode 1: Auth0 (Production/Staging)
-    if AUTH0_DOMAIN and AUTH0_AUDIENCE:
+    if settings.auth0_enabled:
         try:
-            rsa_key = get_auth0_public_key(token)
+            rsa_key = await get_auth0_public_key(token)
             if rsa_key:
                 payload = jwt.decode(
                     token,
                     rsa_key,
-                    algorithms=AUTH0_ALGORITHMS,
-                    audience=AUTH0_AUDIENCE,
-                    issuer=f"https://{AUTH0_DOMAIN}/"
+                    algorithms=_ALGORITHMS_TUPLE,
+                    audience=settings.auth0_audience,
+                    issuer=settings.auth0_issuer
                 )
                 # Map Auth0 claims to our user structure
                 # Custom claims usually have a namespace, e.g. https://tilli.com/role
@@ -121,26 +216,28 @@ def verify_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(s
                 role = payload.get("https://tilli.com/role", "educator") 
                 school_id = payload.get("https://tilli.com/school_id", "School 1") # Default for demo
                 
-                return {
+                user = {
                     "user_id": user_id,
                     "role": role,
                     "school_id": school_id,
                     "authenticated": True,
                     "provider": "auth0"
                 }
+                _remember_verified_token(cache_key, token, payload, user)
+                return user
             else:
                 raise HTTPException(status_code=401, detail="Invalid token signature (key not found)")
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=401, detail="Token is expired")
-        except jwt.JWTClaimsError:
+        except (jwt.InvalidAudienceError, jwt.InvalidIssuerError):
             raise HTTPException(status_code=401, detail="Incorrect claims (check audience/issuer)")
         except Exception as e:
-            logger.warning(f"Auth0 validation failed: {e}")
+            logger.warning("Auth0 validation failed: %s", e)
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
     # Mode 2: Local Dev (HS256)
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=_LOCAL_ALGORITHMS)
         user_id: str = payload.get("sub") or payload.get("user_id")
         role: str = payload.get("role", "educator")
         school_id: str = payload.get("school_id", "School 1")
@@ -148,11 +245,13 @@ def verify_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(s
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token payload")
         
-        logger.debug(f"Authenticated user: {user_id}, role: {role}")
-        return {"user_id": user_id, "role": role, "school_id": school_id, "authenticated": True}
+        logger.debug("Authenticated user: %s, role: %s", user_id, role)
+        user = {"user_id": user_id, "role": role, "school_id": school_id, "authenticated": True}
+        _remember_verified_token(cache_key, token, payload, user)
+        return user
         
-    except JWTError as e:
-        logger.warning(f"JWT decode error: {str(e)}")
+    except jwt.PyJWTError as e:
+        logger.warning("JWT decode error: %s", e)
         raise HTTPException(
             status_code=401,
             detail="Invalid authentication token",
@@ -0,0 +1,23 @@
+"""
+CORS Middleware
+
+Thin wrapper around Starlette's CORSMiddleware that skips CORS processing for
+requests without an Origin header (health probes, server-to-server calls).
+"""
+from starlette.middleware.cors import CORSMiddleware
+from starlette.types import Receive, Scope, Send
+
+
+class FastPathCORSMiddleware(CORSMiddleware):
+    """
+    CORSMiddleware that passes non-CORS requests straight to the app.
+    
+    Scans the raw ASGI header list for an Origin header instead of building a
+    Headers object; only requests that carry one go through the full CORS logic.
+    """
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not any(name == b"origin" for name, _ in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -4,23 +4,22 @@ Data Access Control Middleware
 Verifies that users have permission to access requested data.
 Implements application-level authorization (not IAM authentication).
 """
-import os
+import asyncio
 import logging
 from typing import Optional
 from fastapi import HTTPException, Depends
 
+from ..config import get_settings
 from ..middleware.auth import verify_token
 from ..services.database import (
+    get_access_context,
     get_educator_classrooms,
-    get_student_classrooms,
-    get_student_school,
-    get_educator_school
+    get_student_school
 )
 
 logger = logging.getLogger(__name__)
 
-# Feature flag - can be disabled for testing
-ENABLE_DATA_ACCESS_CONTROL = os.getenv("ENABLE_DATA_ACCESS_CONTROL", "false").lower() == "true"
+settings = get_settings()
 
 
 async def verify_data_access(
@@ -47,7 +46,7 @@ async def verify_data_access(
         HTTPException: 403 Forbidden if access is denied
     """
     # If data access control is disabled, allow all requests
-    if not ENABLE_DATA_ACCESS_CONTROL:
+    if not settings.enable_data_access_control:
         logger.debug("Data access control is disabled - allowing request")
         return True
     
@@ -56,8 +55,8 @@ async def verify_data_access(
     user_school_id = current_user.get("school_id")
     
     logger.info(
-        f"Checking data access: user={user_id}, role={user_role}, "
-        f"student_id={student_id}, classroom_id={classroom_id}"
+        "Checking data access: user=%s, role=%s, student_id=%s, classroom_id=%s",
+        user_id, user_role, student_id, classroom_id
     )
     
     # Admins can access all data in their school
@@ -67,24 +66,33 @@ async def verify_data_access(
             student_school = await get_student_school(student_id)
             if student_school and student_school != user_school_id:
                 logger.warning(
-                    f"Admin {user_id} attempted cross-school access: "
-                    f"user_school={user_school_id}, student_school={student_school}"
+                    "Admin %s attempted cross-school access: user_school=%s, student_school=%s",
+                    user_id, user_school_id, student_school
                 )
                 raise HTTPException(
                     status_code=403,
                     detail="Access denied: Cross-school access not permitted"
                 )
-        logger.info(f"Admin {user_id} granted access")
+        logger.info("Admin %s granted access", user_id)
         return True
     
     # For educators, check specific permissions
     if user_role == "educator":
+        # Student and classroom checks are independent, so run them concurrently
+        if student_id and classroom_id:
+            student_access, classroom_access = await asyncio.gather(
+                check_educator_student_access(user_id, student_id),
+                check_educator_classroom_access(user_id, classroom_id)
+            )
+        else:
+            student_access = await check_educator_student_access(user_id, student_id) if student_id else True
+            classroom_access = await check_educator_classroom_access(user_id, classroom_id) if classroom_id else True
+        
         # Check student access
         if student_id:
-            has_access = await check_educator_student_access(user_id, student_id)
-            if not has_access:
+            if not student_access:
                 logger.warning(
-                    f"Educator {user_id} denied access to student {student_id}"
+                    "Educator %s denied access to student %s", user_id, student_id
                 )
                 # Generic error - no data leakage
                 raise HTTPException(
@@ -94,10 +102,9 @@ async def verify_data_access(
         
         # Check classroom access
         if classroom_id:
-            has_access = await check_educator_classroom_access(user_id, classroom_id)
-            if not has_access:
+            if not classroom_access:
                 logger.warning(
-                    f"Educator {user_id} denied access to classroom {classroom_id}"
+                    "Educator %s denied access to classroom %s", user_id, classroom_id
                 )
                 # Generic error - no data leakage
                 raise HTTPException(
@@ -105,11 +112,11 @@ async def verify_data_access(
                     detail="Access denied: You are not authorized to view this student or class."
                 )
         
-        logger.info(f"Educator {user_id} granted access")
+        logger.info("Educator %s granted access", user_id)
         return True
     
     # Unknown role - deny by default
-    logger.warning(f"Unknown role {user_role} for user {user_id} - denying access")
+    logger.warning("Unknown role %s for user %s - denying access", user_role, user_id)
     # Generic error - no data leakage
     raise HTTPException(
         status_code=403,
@@ -128,22 +135,21 @@ async def check_educator_student_access(educator_id: str, student_id: str) -> bo
     Returns:
         True if educator teaches this student
     """
-    # Get educator's classrooms
-    educator_classrooms = await get_educator_classrooms(educator_id)
-    
-    # Get student's classrooms
-    student_classrooms = await get_student_classrooms(student_id)
+    # Both rosters come from one cached lookup (a single query on a cold cache)
+    educator_context, student_context = await get_access_context(educator_id, student_id)
+    educator_classrooms = educator_context["classroom_ids"]
+    student_classrooms = student_context["classroom_ids"]
     
-    # Check if there's any overlap
-    common_classrooms = set(educator_classrooms) & set(student_classrooms)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Educator %s classrooms: %s, Student %s classrooms: %s",
+            educator_id, educator_classrooms, student_id, student_classrooms
+        )
     
-    logger.debug(
-        f"Educator {educator_id} classrooms: {educator_classrooms}, "
-        f"Student {student_id} classrooms: {student_classrooms}, "
-        f"Common: {common_classrooms}"
-    )
-    
-    return bool(common_classrooms)
+    # Check if there's any overlap (stops at the first shared classroom)
+    if not isinstance(educator_classrooms, (set, frozenset)):
+        educator_classrooms = frozenset(educator_classrooms)
+    return not educator_classrooms.isdisjoint(student_classrooms)
 
 
 async def check_educator_classroom_access(educator_id: str, classroom_id: str) -> bool:
@@ -159,9 +165,10 @@ async def check_educator_classroom_access(educator_id: str, classroom_id: str) -
     """
     educator_classrooms = await get_educator_classrooms(educator_id)
     
-    logger.debug(
-        f"Educator {educator_id} classrooms: {educator_classrooms}, "
-        f"Checking access to: {classroom_id}"
-    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Educator %s classrooms: %s, Checking access to: %s",
+            educator_id, educator_classrooms, classroom_id
+        )
     
     return classroom_id in educator_classrooms
@@ -4,7 +4,10 @@ Chat API Models
 Pydantic models for the /chat endpoint that mirrors the emt-api structure.
 """
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from typing_extensions import TypedDict  # pydantic requires typing_extensions.TypedDict before Python 3.12
+from pydantic import BaseModel, Field, with_config
+
+from .query_models import REQUEST_MODEL_CONFIG
 
 
 class ChatHistoryMessage(BaseModel):
@@ -15,10 +18,23 @@ class ChatHistoryMessage(BaseModel):
         role: Role of the message sender (e.g., "user", "assistant", "system")
         text: Content of the message
     """
+    model_config = REQUEST_MODEL_CONFIG
+    
     role: str = Field(..., description="Role of the message sender (user/assistant/system)")
     text: str = Field(..., description="Content of the message")
 
 
+@with_config(REQUEST_MODEL_CONFIG)
+class ChatHistoryMessageDict(TypedDict):
+    """
+    Lightweight history entry validated by pydantic-core without building a model per message.
+    
+    Same fields and constraints as ChatHistoryMessage.
+    """
+    role: str
+    text: str
+
+
 class ChatRequest(BaseModel):
     """
     Request model for the /chat endpoint.
@@ -35,12 +51,14 @@ class ChatRequest(BaseModel):
         scores: SEL assessment scores data structure
         history: Previous conversation messages
     """
+    model_config = REQUEST_MODEL_CONFIG
+    
     message: str = Field(..., description="The user's current message or question")
     scores: Dict[str, Any] = Field(
         default_factory=dict,
         description="SEL assessment scores data (supports 4 assessments: child, parent, teacher_report, teacher_survey)"
     )
-    history: List[ChatHistoryMessage] = Field(
+    history: List[ChatHistoryMessageDict] = Field(
         default_factory=list,
         description="Previous conversation history"
     )
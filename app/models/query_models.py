@@ -1,12 +1,20 @@
 """
 Query models for the Master Agent API.
 """
-from pydantic import BaseModel, Field, validator, constr
+import re
+from pydantic import BaseModel, ConfigDict, Field, field_validator, constr
 from typing import Optional, List, Dict, Any
 
+_IDENTIFIER_RE = re.compile(r'[A-Za-z0-9_.-]+')
+
+# Request bodies: reject unknown fields and cap string sizes in pydantic-core
+REQUEST_MODEL_CONFIG = ConfigDict(extra='forbid', frozen=True, str_max_length=8192)
+
 
 class AskRequest(BaseModel):
     """Request model for the /ask endpoint."""
+    model_config = REQUEST_MODEL_CONFIG
+    
     question: constr(min_length=1, max_length=5000) = Field(
         ..., 
         description="Educator's natural language question"
@@ -24,21 +32,22 @@ class AskRequest(BaseModel):
         description="Optional classroom ID filter (alphanumeric, hyphens, underscores, dots only)"
     )
     
-    @validator('question')
+    @field_validator('question')
+    @classmethod
     def validate_question(cls, v):
         """Basic validation - full sanitization happens in router."""
         if not v or not v.strip():
             raise ValueError('Question cannot be empty')
         return v.strip()
     
-    @validator('student_id', 'classroom_id')
+    @field_validator('student_id', 'classroom_id')
+    @classmethod
     def validate_identifier(cls, v):
         """Validate identifier format."""
         if v is None:
             return v
         # Check for only allowed characters (will be further sanitized in router)
-        import re
-        if not re.match(r'^[A-Za-z0-9_.-]+$', v):
+        if not _IDENTIFIER_RE.fullmatch(v):
             raise ValueError(
                 'Identifier contains invalid characters. '
                 'Only letters, numbers, hyphens, underscores, and dots are allowed.'
@@ -76,9 +85,9 @@ class PromptEvalRequest(BaseModel):
     data_summary: Optional[Dict[str, Any]] = Field(None, description="Data summary used in the prompt")
     evaluation_metrics: Optional[Dict[str, Any]] = Field(None, description="Evaluation metrics from the eval tool")
     timestamp: Optional[str] = Field(None, description="Timestamp of the evaluation")
+    
     # Allow additional fields from the eval tool
-    class Config:
-        extra = "allow"
+    model_config = ConfigDict(extra="allow")
 
 
 class PromptEvalResponse(BaseModel):
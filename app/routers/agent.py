@@ -3,9 +3,10 @@ Agent Router
 
 Main endpoint for the Master Agent that handles educator questions.
 """
+import asyncio
 import logging
 import re
-from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, Depends
 from datetime import datetime
 
 from ..models.query_models import AskRequest, AskResponse
@@ -15,24 +16,36 @@ from ..services.security import InputSanitizer, SecurityError
 from ..services.harmful_content_detector import HarmfulContentDetector
 from ..services.audit_logger import FERPAAuditLogger
 from ..middleware.auth import verify_token
+from ..middleware.data_access import verify_data_access
 from ..middleware.rate_limit import limiter, RATE_LIMITS
 from ..services import csv_data
+from ..services.service_manager import get_data_router, get_llm_engine
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/agent", tags=["agent"])
-data_router = DataRouter()
-llm_engine = LLMEngine()
 harmful_content_detector = HarmfulContentDetector(enabled=True)
 audit_logger = FERPAAuditLogger(enabled=True)
 
-COMPARISON_KEYWORDS = [
+# School mention in a question, e.g. "How did School Lincoln perform?" (group 1 = "Lincoln")
+_SCHOOL_RE = re.compile(
+    r"school\s+([\w\d\s]+?)(?=\s+(?:perform|score|result|do|did|is|was)|$|[?.,])",
+    re.IGNORECASE
+)
+
+COMPARISON_KEYWORDS = (
     "before", "after", "growth", "change", "progress", "improve", "improvement", "compare", "comparison", "trend"
-]
+)
+
+# One regex pass over the question instead of a substring scan per keyword.
+# No word boundaries: keywords also match inside words ("improved", "changes") as before.
+_COMPARISON_RE = re.compile("|".join(map(re.escape, COMPARISON_KEYWORDS)), re.IGNORECASE)
+
+# Answer confidence indexed by number of data sources used (capped at 2)
+CONFIDENCE_LEVELS = ("low", "medium", "high")
 
 def _needs_prepost_comparison(question: str) -> bool:
-    q = (question or "").lower()
-    return any(k in q for k in COMPARISON_KEYWORDS)
+    return _COMPARISON_RE.search(question or "") is not None
 
 
 @router.post("/ask", response_model=AskResponse)
@@ -40,7 +53,10 @@ def _needs_prepost_comparison(question: str) -> bool:
 async def ask_question(
     request: Request,
     ask_request: AskRequest,
-    current_user: dict = Depends(verify_token)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(verify_token),
+    data_router: DataRouter = Depends(get_data_router),
+    llm_engine: LLMEngine = Depends(get_llm_engine)
 ) -> AskResponse:
     """
     Main endpoint for educator questions.
@@ -56,7 +72,10 @@ async def ask_question(
     Args:
         request: FastAPI Request object (for rate limiting)
         ask_request: AskRequest containing the educator's question and optional filters
+        background_tasks: Audit writes that are not on the response path run here
         current_user: Authenticated user information (from auth middleware)
+        data_router: Shared DataRouter from app.state
+        llm_engine: Shared LLM engine from app.state
         
     Returns:
         AskResponse with the generated answer and metadata
@@ -64,6 +83,13 @@ async def ask_question(
     Raises:
         HTTPException: For validation errors, security violations, or processing errors
     """
+    # Caller identity and address, read once and reused by the logging and audit calls below
+    user_id = current_user.get('user_id', 'unknown')
+    user_email = current_user.get('email')
+    user_role = current_user.get('role', 'educator')
+    school_id = current_user.get('school_id')
+    client_ip = request.client.host if request.client else None
+    
     try:
         # Step 0: Sanitize and validate all inputs
         try:
@@ -76,14 +102,14 @@ async def ask_question(
             # Extract school identifier from the question
             # Capture "school" followed by words, allowing for multi-word names like "Lincoln High"
             # Regex: school\s+ (one or more words)
-            school_match = re.search(r"school\s+([\w\d\s]+?)(?=\s+(?:perform|score|result|do|did|is|was)|$|[?.,])", sanitized_question, re.IGNORECASE)
+            school_match = _SCHOOL_RE.search(sanitized_question)
             extracted_school_raw = school_match.group(0) if school_match else None # "School Lincoln"
             extracted_school_name = school_match.group(1) if school_match else None # "Lincoln"
             
             extracted_school = extracted_school_raw # Keep full string for fetch_data (CSV likely needs "School X")
 
             # --- Data Access Control: School Isolation ---
-            user_school_id = current_user.get("school_id")
+            user_school_id = school_id
             
             # If user has a school_id (educators/admins usually do), enforce it
             if user_school_id:
@@ -97,7 +123,7 @@ async def ask_question(
                     # Check for overlap
                     if s_name not in s_user and s_user not in s_name:
                         logger.warning(
-                            f"Access denied: User {current_user.get('user_id')} (School: {user_school_id}) "
+                            f"Access denied: User {user_id} (School: {user_school_id}) "
                             f"attempted to access {extracted_school}"
                         )
                         raise HTTPException(
@@ -121,14 +147,20 @@ async def ask_question(
             )
         
         # Step 0.5: Detect harmful content in question
-        user_id = current_user.get('user_id', 'unknown')
-        school_id = current_user.get('school_id')
+        question_length = len(sanitized_question)
+        question_preview = sanitized_question[:200] or None
         
-        question_harm_detection = harmful_content_detector.detect_harmful_content(
-            text=sanitized_question,
-            context="question",
-            user_id=user_id,
-            school_id=school_id
+        # The harm scan and data-source planning are independent CPU passes over the
+        # question, so run them concurrently off the event loop (Step 1 happens here too).
+        question_harm_detection, data_sources = await asyncio.gather(
+            asyncio.to_thread(
+                harmful_content_detector.detect_harmful_content,
+                text=sanitized_question,
+                context="question",
+                user_id=user_id,
+                school_id=school_id
+            ),
+            asyncio.to_thread(data_router.determine_data_sources, sanitized_question)
         )
         
         if question_harm_detection.get("is_harmful"):
@@ -143,22 +175,26 @@ async def ask_question(
             )
             harmful_content_detector.log_alert(alert)
             
-            # Log to audit trail (FERPA/UNICEF compliance)
-            audit_logger.log_harmful_content(
+            # Audit trail entry (FERPA/UNICEF compliance)
+            harm_audit = dict(
                 user_id=user_id,
-                user_email=current_user.get('email'),
+                user_email=user_email,
                 school_id=school_id,
                 severity=question_harm_detection.get("severity", "low"),
                 harm_types=question_harm_detection.get("harm_types", []),
                 context="question",
                 student_id=sanitized_student_id,
                 matches_count=len(question_harm_detection.get("matches", [])),
-                text_preview=sanitized_question[:200] if sanitized_question else None,
-                ip_address=request.client.host if request.client else None,
+                text_preview=question_preview,
+                ip_address=client_ip,
                 session_id=None,  # TODO: Get from session
                 alert_metadata={"alert": alert}
             )
             
+            # Written now rather than as a background task: those are dropped when the
+            # request ends in an error (a later 403/400/500), which would lose this record
+            audit_logger.log_harmful_content(**harm_audit)
+            
             # Block critical/high severity content
             if harmful_content_detector.should_block_response(question_harm_detection):
                 logger.critical(
@@ -174,7 +210,6 @@ async def ask_question(
         
         # Step 0.75: Verify data access authorization (BEFORE data retrieval)
         # This enforces class-level and student-level authorization
-        from ..middleware.data_access import verify_data_access
         try:
             await verify_data_access(
                 current_user=current_user,
@@ -186,12 +221,12 @@ async def ask_question(
             # Log access denied event for audit
             audit_logger.log_security_event(
                 user_id=user_id,
-                user_email=current_user.get('email'),
+                user_email=user_email,
                 school_id=school_id,
                 event_type="access_denied",
                 severity="medium",
                 description=f"Data access denied: student_id={sanitized_student_id}, classroom_id={sanitized_classroom_id}",
-                ip_address=request.client.host if request.client else None,
+                ip_address=client_ip,
                 metadata={
                     "student_id": sanitized_student_id,
                     "classroom_id": sanitized_classroom_id,
@@ -201,18 +236,18 @@ async def ask_question(
             raise  # Re-raise the 403 Forbidden
         
         # Log request for audit trail
-        logger.info(
-            f"Request from user {current_user.get('user_id', 'unknown')}: "
-            f"question_length={len(sanitized_question)}, "
-            f"student_id={sanitized_student_id is not None}, "
-            f"classroom_id={sanitized_classroom_id is not None}"
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                f"Request from user {user_id}: "
+                f"question_length={question_length}, "
+                f"student_id={sanitized_student_id is not None}, "
+                f"classroom_id={sanitized_classroom_id is not None}"
+            )
         
-        # Step 1: Determine which data sources are needed
-        data_sources = data_router.determine_data_sources(sanitized_question)
+        # Step 1 (data source selection) already ran alongside the question harm scan
         
         # Step 2: Fetch data from relevant sources
-        dataset = data_router.fetch_data(
+        dataset = await data_router.afetch_data(
             data_sources=data_sources,
             grade_level=sanitized_grade_level,
             student_id=sanitized_student_id,
@@ -224,13 +259,13 @@ async def ask_question(
         data_summary = data_router.format_data_for_llm(dataset)
         
         # Step 3.5: If question implies pre/post comparison, build comparison summary from CSV
-        # Basic heuristic: detect keywords and extract grade if present in request
-        if _needs_prepost_comparison(sanitized_question):
+        # Basic heuristic: detect keywords and extract grade if present in request.
+        # The CSV holds SEL score exports, so skip it when SEL data is not in scope.
+        if "SEL" in data_sources and _needs_prepost_comparison(sanitized_question):
             try:
                 grade_hint = sanitized_grade_level or "Grade 1"  # default to Grade 1 if not provided
-                pre_rows = csv_data.filter_scores(grade=grade_hint, test_type="pre")
-                post_rows = csv_data.filter_scores(grade=grade_hint, test_type="post")
-                comparison_summary = csv_data.build_comparison_summary(pre_rows, post_rows)
+                summaries = await asyncio.to_thread(csv_data.prepost_summaries, grade=grade_hint)
+                comparison_summary = summaries["comparison"]
                 # Attach to data summary so the LLM can use it
                 data_summary["prepost_comparison"] = {
                     "grade": grade_hint,
@@ -240,7 +275,7 @@ async def ask_question(
                 logger.warning(f"Pre/Post comparison unavailable: {str(e)}")
         
         # Step 4: Generate response using LLM (prompt sanitization happens inside)
-        answer = llm_engine.generate_response(
+        answer = await llm_engine.agenerate_response(
             question=sanitized_question,
             data_summary=data_summary
         )
@@ -265,10 +300,11 @@ async def ask_question(
             )
             harmful_content_detector.log_alert(alert)
             
-            # Log to audit trail (FERPA/UNICEF compliance)
-            audit_logger.log_harmful_content(
+            # Log to audit trail (FERPA/UNICEF compliance) after the response is sent
+            background_tasks.add_task(
+                audit_logger.log_harmful_content,
                 user_id=user_id,
-                user_email=current_user.get('email'),
+                user_email=user_email,
                 school_id=school_id,
                 severity=response_harm_detection.get("severity", "low"),
                 harm_types=response_harm_detection.get("harm_types", []),
@@ -276,7 +312,7 @@ async def ask_question(
                 student_id=sanitized_student_id,
                 matches_count=len(response_harm_detection.get("matches", [])),
                 text_preview=answer[:200] if answer else None,
-                ip_address=request.client.host if request.client else None,
+                ip_address=client_ip,
                 session_id=None,  # TODO: Get from session
                 alert_metadata={"alert": alert}
             )
@@ -295,24 +331,23 @@ async def ask_question(
                 )
         
         # Step 5: Determine confidence (placeholder logic)
-        confidence = "high" if len(data_sources) >= 2 else "medium"
-        if not data_sources:
-            confidence = "low"
+        confidence = CONFIDENCE_LEVELS[min(len(data_sources), 2)]
         
-        # Step 6: Log data access for FERPA/UNICEF compliance
-        audit_logger.log_data_access(
+        # Step 6: Log data access for FERPA/UNICEF compliance (after the response is sent)
+        background_tasks.add_task(
+            audit_logger.log_data_access,
             user_id=user_id,
-            user_email=current_user.get('email', 'unknown'),
-            user_role=current_user.get('role', 'educator'),
+            user_email=user_email or 'unknown',
+            user_role=user_role,
             school_id=school_id or 'unknown',
             action="query",  # Action type
             purpose="Educational inquiry - analyzing student assessment data",  # UNICEF requirement: why data was accessed
             student_id=sanitized_student_id,
             classroom_id=sanitized_classroom_id,
             grade_level=sanitized_grade_level,
-            question=sanitized_question,  # Length only, not full text
+            question_length=question_length,  # Length only, not full text
             data_sources_accessed=data_sources,
-            ip_address=request.client.host if request.client else None,
+            ip_address=client_ip,
             session_id=None,  # TODO: Get from session
             metadata={
                 "confidence": confidence,
@@ -4,8 +4,9 @@ Chat Router
 REST API endpoint that mirrors the emt-api chat() function structure.
 Provides conversational interface for SEL assessment analysis.
 """
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, Depends
 from typing import Dict, Any
 
 from ..models.chat_models import ChatRequest, ChatResponse
@@ -15,11 +16,11 @@ from ..services.harmful_content_detector import HarmfulContentDetector
 from ..services.audit_logger import FERPAAuditLogger
 from ..middleware.auth import verify_token
 from ..middleware.rate_limit import limiter, RATE_LIMITS
+from ..services.service_manager import get_llm_engine
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
-llm_engine = LLMEngine()
 harmful_content_detector = HarmfulContentDetector(enabled=True)
 audit_logger = FERPAAuditLogger(enabled=True)
 
@@ -67,7 +68,9 @@ You'll be given the following structure for the scores for each assessment:
 async def chat(
     request: Request,
     chat_request: ChatRequest,
-    current_user: dict = Depends(verify_token)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(verify_token),
+    llm_engine: LLMEngine = Depends(get_llm_engine)
 ) -> ChatResponse:
     """
     Chat endpoint that mirrors the emt-api chat() function structure.
@@ -81,7 +84,9 @@ async def chat(
     Args:
         request: FastAPI Request object (for rate limiting)
         chat_request: ChatRequest with message, scores, and history
+        background_tasks: Audit writes that are not on the response path run here
         current_user: Authenticated user information
+        llm_engine: Shared LLM engine from app.state
         
     Returns:
         ChatResponse with the generated text
@@ -89,6 +94,13 @@ async def chat(
     Raises:
         HTTPException: For validation errors, security violations, or processing errors
     """
+    # Caller identity and address, read once and reused by the logging and audit calls below
+    user_id = current_user.get('user_id', 'unknown')
+    user_email = current_user.get('email')
+    user_role = current_user.get('role', 'educator')
+    school_id = current_user.get('school_id')
+    client_ip = request.client.host if request.client else None
+    
     try:
         # Step 0: Sanitize and validate inputs
         try:
@@ -101,10 +113,12 @@ async def chat(
             )
         
         # Step 0.5: Detect harmful content in message
-        user_id = current_user.get('user_id', 'unknown')
-        school_id = current_user.get('school_id')
+        message_length = len(sanitized_message)
+        message_preview = sanitized_message[:200] or None
         
-        message_harm_detection = harmful_content_detector.detect_harmful_content(
+        # Regex scan runs in a worker thread so it does not stall the event loop
+        message_harm_detection = await asyncio.to_thread(
+            harmful_content_detector.detect_harmful_content,
             text=sanitized_message,
             context="chat_message",
             user_id=user_id,
@@ -122,19 +136,23 @@ async def chat(
             )
             harmful_content_detector.log_alert(alert)
             
-            # Log to audit trail
-            audit_logger.log_harmful_content(
+            # Audit trail entry
+            harm_audit = dict(
                 user_id=user_id,
-                user_email=current_user.get('email'),
+                user_email=user_email,
                 school_id=school_id,
                 severity=message_harm_detection.get("severity", "low"),
                 harm_types=message_harm_detection.get("harm_types", []),
                 context="chat_message",
                 matches_count=len(message_harm_detection.get("matches", [])),
-                text_preview=sanitized_message[:200] if sanitized_message else None,
-                ip_address=request.client.host if request.client else None
+                text_preview=message_preview,
+                ip_address=client_ip
             )
             
+            # Written now rather than as a background task: those are dropped when the
+            # request ends in an error (e.g. a later 500), which would lose this record
+            audit_logger.log_harmful_content(**harm_audit)
+            
             # Block critical/high severity content
             if harmful_content_detector.should_block_response(message_harm_detection):
                 logger.critical(
@@ -148,31 +166,34 @@ async def chat(
                 )
         
         # Step 1: Build conversation context (matching emt-api structure)
-        conversation = [SYSTEM_INSTRUCTION_CHAT]
+        # The system instruction is passed separately so Gemini receives it as system_instruction
+        conversation = []
         
         # Add SEL scores to context
         if chat_request.scores:
             conversation.append(f"School-level SEL scores: {chat_request.scores}")
         
-        # Add conversation history
-        for msg in chat_request.history:
-            role = msg.role
-            text = msg.text
-            conversation.append(f"{role.capitalize()}: {text}")
+        # Add conversation history as one block (the LLM layer joins segments with "\n")
+        if chat_request.history:
+            conversation.append("\n".join(
+                f"{msg['role'].capitalize()}: {msg['text']}" for msg in chat_request.history
+            ))
         
         # Add current message
         conversation.append(f"User: {sanitized_message}")
         
         # Step 2: Generate response using LLM
-        logger.info(
-            f"Chat request from user {user_id}: "
-            f"message_length={len(sanitized_message)}, "
-            f"history_length={len(chat_request.history)}"
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                f"Chat request from user {user_id}: "
+                f"message_length={message_length}, "
+                f"history_length={len(chat_request.history)}"
+            )
         
-        response_text = llm_engine.generate_chat_response(
+        response_text = await llm_engine.agenerate_chat_response(
             conversation=conversation,
-            max_tokens=500
+            max_tokens=500,
+            system_instruction=SYSTEM_INSTRUCTION_CHAT
         )
         
         # Step 2.5: Detect harmful content in response
@@ -194,17 +215,18 @@ async def chat(
             )
             harmful_content_detector.log_alert(alert)
             
-            # Log to audit trail
-            audit_logger.log_harmful_content(
+            # Log to audit trail after the response is sent
+            background_tasks.add_task(
+                audit_logger.log_harmful_content,
                 user_id=user_id,
-                user_email=current_user.get('email'),
+                user_email=user_email,
                 school_id=school_id,
                 severity=response_harm_detection.get("severity", "low"),
                 harm_types=response_harm_detection.get("harm_types", []),
                 context="chat_response",
                 matches_count=len(response_harm_detection.get("matches", [])),
                 text_preview=response_text[:200] if response_text else None,
-                ip_address=request.client.host if request.client else None
+                ip_address=client_ip
             )
             
             # Block critical/high severity content in response
@@ -218,17 +240,18 @@ async def chat(
                     "Please rephrase your question or contact support for assistance."
                 )
         
-        # Step 3: Log chat interaction for audit trail
-        audit_logger.log_data_access(
+        # Step 3: Log chat interaction for audit trail (after the response is sent)
+        background_tasks.add_task(
+            audit_logger.log_data_access,
             user_id=user_id,
-            user_email=current_user.get('email', 'unknown'),
-            user_role=current_user.get('role', 'educator'),
+            user_email=user_email or 'unknown',
+            user_role=user_role,
             school_id=school_id or 'unknown',
             action="chat",
             purpose="SEL assessment analysis via chat interface",
-            question=sanitized_message,
+            question_length=message_length,
             data_sources_accessed=["SEL_SCORES"],
-            ip_address=request.client.host if request.client else None,
+            ip_address=client_ip,
             metadata={
                 "response_length": len(response_text) if response_text else 0,
                 "history_length": len(chat_request.history),
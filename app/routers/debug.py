@@ -4,6 +4,7 @@ Debug Router
 Internal endpoints to inspect PRE/POST data directly from the CSV.
 Not intended for production use.
 """
+import asyncio
 import logging
 from typing import Dict, Any, Optional
 from fastapi import APIRouter, HTTPException, Query, Depends
@@ -27,20 +28,16 @@ async def debug_pre_post(
 	Return raw PRE and POST summaries and a comparison object for the given grade/assessment.
 	"""
 	try:
-		pre_rows = csv_data.filter_scores(grade=grade, assessment=assessment, test_type="pre", file_name=file_name)
-		post_rows = csv_data.filter_scores(grade=grade, assessment=assessment, test_type="post", file_name=file_name)
-		
-		pre_summary = csv_data.summarize_rows(pre_rows)
-		post_summary = csv_data.summarize_rows(post_rows)
-		compare = csv_data.build_comparison_summary(pre_rows, post_rows)
+		summaries = await asyncio.to_thread(
+			csv_data.prepost_summaries, grade=grade, assessment=assessment, file_name=file_name
+		)
 		
 		return {
 			"filters": {"grade": grade, "assessment": assessment, "file_name": file_name},
-			"counts": {"rows_pre": len(pre_rows), "rows_post": len(post_rows)},
-			"pre": pre_summary,
-			"post": post_summary,
-			"comparison": compare,
+			**summaries,
 		}
+	except csv_data.InvalidDataFileError as e:
+		raise HTTPException(status_code=400, detail=str(e))
 	except FileNotFoundError as e:
 		raise HTTPException(status_code=404, detail=str(e))
 	except Exception as e:
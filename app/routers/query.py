@@ -3,20 +3,23 @@ Query Router
 
 Additional query endpoints for testing and data inspection.
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from typing import List, Dict, Any
 
 from ..services.data_router import DataRouter
 from ..services import csv_data
 from ..middleware.auth import require_admin
+from ..services.service_manager import get_data_router
 
 
 router = APIRouter(prefix="/query", tags=["query"])
-data_router = DataRouter()
 
 
 @router.get("/sources")
-async def identify_sources(question: str) -> Dict[str, Any]:
+async def identify_sources(
+    question: str,
+    data_router: DataRouter = Depends(get_data_router)
+) -> Dict[str, Any]:
     """
     Identify which data sources would be used for a given question.
     Useful for testing and debugging the data routing logic.
@@ -35,7 +38,10 @@ async def identify_sources(question: str) -> Dict[str, Any]:
 
 
 @router.get("/test-data")
-async def get_test_data(sources: str = "EMT,SEL") -> Dict[str, Any]:
+async def get_test_data(
+    sources: str = "EMT,SEL",
+    data_router: DataRouter = Depends(get_data_router)
+) -> Dict[str, Any]:
     """
     Fetch test/mock data for specified sources.
     Useful for development and testing.
@@ -73,9 +79,14 @@ async def prepost_comparison(
     - assessment: Filter by assessment type (e.g., "child", "parent", "teacher_report")
     - file_name: CSV file name within data/ (defaults to latest export)
     """
-    rows = csv_data.load_scores(file_name=file_name)
-    filtered = csv_data.filter_records(rows, school=school, grade=grade, assessment=assessment)
-    comparison = csv_data.compute_prepost_comparison(filtered)
+    try:
+        comparison = csv_data.prepost_comparison(
+            school=school, grade=grade, assessment=assessment, file_name=file_name
+        )
+    except csv_data.InvalidDataFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     return {
         "filters": {
             "school": school,
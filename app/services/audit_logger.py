@@ -22,8 +22,9 @@ import gzip
 import hashlib
 import threading
 import time
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, FrozenSet, Iterable
 from enum import Enum
 import asyncio
 import httpx
@@ -51,17 +52,54 @@ class AuditSeverity(Enum):
     CRITICAL = "critical"
 
 
+def process_log_file(log_file: str, pid: int) -> str:
+    """Return the per-process variant of a log path ("audit.log" -> "audit.<pid>.log")."""
+    root, ext = os.path.splitext(log_file)
+    return f"{root}.{pid}{ext}"
+
+
 class ArchivingAuditHandler(logging.handlers.RotatingFileHandler):
     """
     Custom logging handler that rotates logs based on size and archives them
     to a 'cold storage' directory with compression and checksums.
+    
+    Rollover moves the live file away, so only one handler in one process may
+    write a given file. With per_process=True each process writes its own
+    "<name>.<pid><ext>" file (re-derived after a fork), which is how multi-worker
+    deployments share an AUDIT_LOG_FILE setting.
     """
-    def __init__(self, filename, maxBytes=0, backupCount=0, archive_dir=None, encoding=None):
+    # Userspace write buffer for the log stream. Every emit()/emit_many() still
+    # flushes before returning, so this only lets a batch go out in fewer write()s.
+    WRITE_BUFFER_BYTES = 64 * 1024
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, archive_dir=None, encoding=None,
+                 per_process=False):
+        self.per_process = per_process
+        self._template_filename = filename
+        self._pid = os.getpid()
+        if per_process:
+            filename = process_log_file(filename, self._pid)
         super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding)
         self.archive_dir = archive_dir
         if self.archive_dir and not os.path.exists(self.archive_dir):
             os.makedirs(self.archive_dir, exist_ok=True)
 
+    def _ensure_process_file(self):
+        """After a fork, stop writing the parent's file and switch to this process's own."""
+        pid = os.getpid()
+        if not self.per_process or pid == self._pid:
+            return
+        if self.stream:
+            self.stream.close()  # Nothing is pending: every emit flushes before returning
+            self.stream = None
+        self._pid = pid
+        self.baseFilename = os.path.abspath(process_log_file(self._template_filename, pid))
+
+    def emit(self, record):
+        """Emit a record to this process's log file."""
+        self._ensure_process_file()
+        super().emit(record)
+
     def rotate(self, source, dest):
         """
         Override rotate to hook into the rotation process.
@@ -145,6 +183,46 @@ class ArchivingAuditHandler(logging.handlers.RotatingFileHandler):
         if not self.delay:
             self.stream = self._open()
 
+    def _open(self):
+        """Open the log stream with a WRITE_BUFFER_BYTES buffer."""
+        return open(
+            self.baseFilename, self.mode, buffering=self.WRITE_BUFFER_BYTES,
+            encoding=self.encoding, errors=self.errors,
+        )
+
+    def emit_many(self, messages: List[str]):
+        """
+        Append pre-formatted messages with a single flush.
+        
+        Rollover is still checked before every message, exactly as emit() would,
+        so batched and one-at-a-time writes produce the same files.
+        """
+        self.acquire()
+        try:
+            self._ensure_process_file()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.seek(0, 2)  # Flushes pending output, so tell() is the file size
+            size = self.stream.tell()
+            encoding = self.encoding or "utf-8"
+            for msg in messages:
+                line = msg + self.terminator
+                if self.maxBytes > 0 and size + len(line) >= self.maxBytes:
+                    self.doRollover()
+                    if self.stream is None:
+                        self.stream = self._open()
+                    size = self.stream.tell()
+                self.stream.write(line)
+                # Track the on-disk size without tell(), which would flush every line
+                # (text mode writes the terminator as os.linesep)
+                size += len(msg.encode(encoding)) + len(os.linesep)
+            self.flush()
+        except Exception as e:
+            # Same policy as doRollover: report on stderr, never raise into the request
+            print(f"Error writing audit log batch: {e}", file=sys.stderr)
+        finally:
+            self.release()
+
     def _compress_and_hash(self, file_path):
         """
         Compress the file and generate a SHA-256 checksum.
@@ -177,6 +255,130 @@ class ArchivingAuditHandler(logging.handlers.RotatingFileHandler):
             print(f"Error archiving audit log {file_path}: {e}", file=sys.stderr)
 
 
+@dataclass(frozen=True, slots=True)
+class AuditConfig:
+    """Audit logger configuration, read from the environment once per logger."""
+
+    log_file: str
+    log_to_file: bool
+    log_to_stdout: bool
+    max_bytes: int
+    backup_count: int
+    archive_dir: str
+    per_process_files: bool
+    enabled_sinks: FrozenSet[str]
+    hostname: str
+    splunk_hec_url: Optional[str]
+    splunk_hec_token: Optional[str]
+    splunk_source: str
+    splunk_sourcetype: str
+    splunk_index: Optional[str]
+    webhook_url: Optional[str]
+    webhook_headers_raw: str
+    webhook_headers: Dict[str, Any]
+    os_url: Optional[str]
+    os_index: str
+    os_username: Optional[str]
+    os_password: Optional[str]
+    os_verify: bool
+    http_timeout_seconds: float
+    http_max_retries: int
+
+    @classmethod
+    def from_env(cls) -> "AuditConfig":
+        """
+        Build the audit configuration from the current environment.
+
+        Returns:
+            AuditConfig instance
+        """
+        env = os.environ
+        webhook_headers_raw = env.get("AUDIT_WEBHOOK_HEADERS", "{}")
+        try:
+            webhook_headers = json.loads(webhook_headers_raw) if webhook_headers_raw else {}
+        except Exception:
+            webhook_headers = {}
+
+        return cls(
+            log_file=env.get("AUDIT_LOG_FILE", "audit.log"),
+            log_to_file=env.get("AUDIT_LOG_TO_FILE", "true").lower() == "true",
+            log_to_stdout=env.get("AUDIT_LOG_STDOUT", "true").lower() == "true",
+            # Default: 10MB max size, keep 10 backups (though our custom handler moves them to archive)
+            max_bytes=int(env.get("AUDIT_LOG_MAX_BYTES", 10 * 1024 * 1024)),
+            backup_count=int(env.get("AUDIT_LOG_BACKUP_COUNT", 10)),
+            archive_dir=env.get("AUDIT_ARCHIVE_DIR", "logs/archive"),
+            # One file per worker process; on by default whenever WEB_CONCURRENCY > 1
+            per_process_files=env.get(
+                "AUDIT_LOG_PER_PROCESS",
+                "true" if int(env.get("WEB_CONCURRENCY", "1")) > 1 else "false"
+            ).lower() == "true",
+            # Pluggable external sinks (comma-separated): splunk,otlp,syslog,future
+            enabled_sinks=frozenset(
+                sink.strip().lower()
+                for sink in env.get("AUDIT_SINKS", "").split(",")
+                if sink.strip()
+            ),
+            hostname=env.get("HOSTNAME", "master-agent"),
+            # Splunk HEC configuration
+            splunk_hec_url=env.get("SPLUNK_HEC_URL"),
+            splunk_hec_token=env.get("SPLUNK_HEC_TOKEN"),
+            splunk_source=env.get("SPLUNK_SOURCE", "master-agent"),
+            splunk_sourcetype=env.get("SPLUNK_SOURCETYPE", "json"),
+            splunk_index=env.get("SPLUNK_INDEX", None),
+            # Generic Webhook sink (works with Logstash/Vector/Fluent Bit/Loki gateways)
+            webhook_url=env.get("AUDIT_WEBHOOK_URL"),
+            webhook_headers_raw=webhook_headers_raw,
+            webhook_headers=webhook_headers,
+            # OpenSearch/Elasticsearch sink
+            os_url=env.get("OPENSEARCH_URL"),  # e.g., https://opensearch:9200
+            os_index=env.get("OPENSEARCH_INDEX", "audits"),
+            os_username=env.get("OPENSEARCH_USERNAME"),
+            os_password=env.get("OPENSEARCH_PASSWORD"),
+            os_verify=env.get("OPENSEARCH_TLS_VERIFY", "true").lower() == "true",
+            # Network timeouts
+            http_timeout_seconds=float(env.get("AUDIT_HTTP_TIMEOUT", "5")),
+            http_max_retries=int(env.get("AUDIT_HTTP_RETRIES", "2")),
+        )
+
+
+# One handler per log file per process: each router builds its own FERPAAuditLogger,
+# and two handlers on one file would lose writes when either rolls the file over.
+_file_handlers: Dict[str, ArchivingAuditHandler] = {}
+_file_handlers_lock = threading.Lock()
+
+
+def _get_file_handler(cfg: AuditConfig) -> ArchivingAuditHandler:
+    """
+    Return this process's handler for cfg.log_file, creating it on first use.
+    
+    The first logger to open a file decides its rotation settings.
+    """
+    path = os.path.abspath(cfg.log_file)
+    with _file_handlers_lock:
+        handler = _file_handlers.get(path)
+        if handler is None:
+            # Ensure log directory exists
+            log_dir = os.path.dirname(path)
+            if log_dir and not os.path.exists(log_dir):
+                os.makedirs(log_dir, exist_ok=True)
+
+            # Use our custom ArchivingAuditHandler
+            handler = ArchivingAuditHandler(
+                filename=path,
+                maxBytes=cfg.max_bytes,
+                backupCount=cfg.backup_count,
+                archive_dir=cfg.archive_dir,
+                encoding='utf-8',
+                per_process=cfg.per_process_files
+            )
+            
+            # JSON Formatter
+            formatter = logging.Formatter('%(message)s')
+            handler.setFormatter(formatter)
+            _file_handlers[path] = handler
+        return handler
+
+
 class FERPAAuditLogger:
     """
     FERPA and UNICEF-compliant audit logger.
@@ -185,25 +387,27 @@ class FERPAAuditLogger:
     Aligns with FERPA, UNICEF, GDPR, and COPPA compliance requirements.
     """
     
-    def __init__(self, enabled: bool = True):
+    def __init__(self, enabled: bool = True, config: Optional[AuditConfig] = None):
         """
         Initialize the audit logger.
         
         Args:
             enabled: Whether to enable audit logging (can be disabled for testing)
+            config: Audit configuration (default: read from the environment)
         """
         self.enabled = enabled
         
-        # Configuration
-        self.log_file = os.getenv("AUDIT_LOG_FILE", "audit.log")
-        self.log_to_file = os.getenv("AUDIT_LOG_TO_FILE", "true").lower() == "true"
-        self.log_to_stdout = os.getenv("AUDIT_LOG_STDOUT", "true").lower() == "true"
+        # Configuration (read once; nothing on the logging path touches os.environ)
+        self.config = config or AuditConfig.from_env()
+        cfg = self.config
+        self.log_file = cfg.log_file
+        self.log_to_file = cfg.log_to_file
+        self.log_to_stdout = cfg.log_to_stdout
         
         # Rotation Configuration
-        # Default: 10MB max size, keep 10 backups (though our custom handler moves them to archive)
-        self.max_bytes = int(os.getenv("AUDIT_LOG_MAX_BYTES", 10 * 1024 * 1024))
-        self.backup_count = int(os.getenv("AUDIT_LOG_BACKUP_COUNT", 10))
-        self.archive_dir = os.getenv("AUDIT_ARCHIVE_DIR", "logs/archive")
+        self.max_bytes = cfg.max_bytes
+        self.backup_count = cfg.backup_count
+        self.archive_dir = cfg.archive_dir
 
         # Initialize Logger
         self.logger = logging.getLogger("audit_logger")
@@ -213,55 +417,30 @@ class FERPAAuditLogger:
         # Clear existing handlers to avoid duplicates on reload
         if self.logger.handlers:
             self.logger.handlers.clear()
+        self._file_handler: Optional[ArchivingAuditHandler] = None
 
         if self.enabled and self.log_to_file and self.log_file:
-            # Ensure log directory exists
-            log_dir = os.path.dirname(self.log_file)
-            if log_dir and not os.path.exists(log_dir):
-                os.makedirs(log_dir, exist_ok=True)
-
-            # Use our custom ArchivingAuditHandler
-            handler = ArchivingAuditHandler(
-                filename=self.log_file,
-                maxBytes=self.max_bytes,
-                backupCount=self.backup_count,
-                archive_dir=self.archive_dir,
-                encoding='utf-8'
-            )
-            
-            # JSON Formatter
-            formatter = logging.Formatter('%(message)s')
-            handler.setFormatter(formatter)
+            handler = _get_file_handler(cfg)
             self.logger.addHandler(handler)
+            self._file_handler = handler
 
-        # Pluggable external sinks (comma-separated): splunk,otlp,syslog,future
-        self.enabled_sinks = {
-            sink.strip().lower()
-            for sink in os.getenv("AUDIT_SINKS", "").split(",")
-            if sink.strip()
-        }
-        # Splunk HEC configuration
-        self.splunk_hec_url = os.getenv("SPLUNK_HEC_URL")
-        self.splunk_hec_token = os.getenv("SPLUNK_HEC_TOKEN")
-        self.splunk_source = os.getenv("SPLUNK_SOURCE", "master-agent")
-        self.splunk_sourcetype = os.getenv("SPLUNK_SOURCETYPE", "json")
-        self.splunk_index = os.getenv("SPLUNK_INDEX", None)
-        # Generic Webhook sink (works with Logstash/Vector/Fluent Bit/Loki gateways)
-        self.webhook_url = os.getenv("AUDIT_WEBHOOK_URL")
-        self.webhook_headers_raw = os.getenv("AUDIT_WEBHOOK_HEADERS", "{}")
-        try:
-            self.webhook_headers = json.loads(self.webhook_headers_raw) if self.webhook_headers_raw else {}
-        except Exception:
-            self.webhook_headers = {}
-        # OpenSearch/Elasticsearch sink
-        self.os_url = os.getenv("OPENSEARCH_URL")  # e.g., https://opensearch:9200
-        self.os_index = os.getenv("OPENSEARCH_INDEX", "audits")
-        self.os_username = os.getenv("OPENSEARCH_USERNAME")
-        self.os_password = os.getenv("OPENSEARCH_PASSWORD")
-        self.os_verify = os.getenv("OPENSEARCH_TLS_VERIFY", "true").lower() == "true"
-        # Network timeouts
-        self.http_timeout_seconds = float(os.getenv("AUDIT_HTTP_TIMEOUT", "5"))
-        self.http_max_retries = int(os.getenv("AUDIT_HTTP_RETRIES", "2"))
+        # External sinks
+        self.enabled_sinks = cfg.enabled_sinks
+        self.splunk_hec_url = cfg.splunk_hec_url
+        self.splunk_hec_token = cfg.splunk_hec_token
+        self.splunk_source = cfg.splunk_source
+        self.splunk_sourcetype = cfg.splunk_sourcetype
+        self.splunk_index = cfg.splunk_index
+        self.webhook_url = cfg.webhook_url
+        self.webhook_headers_raw = cfg.webhook_headers_raw
+        self.webhook_headers = cfg.webhook_headers
+        self.os_url = cfg.os_url
+        self.os_index = cfg.os_index
+        self.os_username = cfg.os_username
+        self.os_password = cfg.os_password
+        self.os_verify = cfg.os_verify
+        self.http_timeout_seconds = cfg.http_timeout_seconds
+        self.http_max_retries = cfg.http_max_retries
         
         if not enabled:
             logger.warning("Audit logging is disabled")
@@ -281,7 +460,8 @@ class FERPAAuditLogger:
         data_sources_accessed: Optional[List[str]] = None,
         ip_address: Optional[str] = None,
         session_id: Optional[str] = None,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        question_length: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Log data access for FERPA and UNICEF compliance.
@@ -303,6 +483,7 @@ class FERPAAuditLogger:
             ip_address: IP address of request
             session_id: Session ID
             metadata: Additional metadata
+            question_length: Precomputed question length (used instead of len(question))
             
         Returns:
             Audit entry dictionary
@@ -310,6 +491,67 @@ class FERPAAuditLogger:
         if not self.enabled:
             return {}
         
+        audit_entry = self._build_data_access_entry(
+            user_id=user_id,
+            user_email=user_email,
+            user_role=user_role,
+            school_id=school_id,
+            action=action,
+            purpose=purpose,
+            student_id=student_id,
+            classroom_id=classroom_id,
+            grade_level=grade_level,
+            question=question,
+            data_sources_accessed=data_sources_accessed,
+            ip_address=ip_address,
+            session_id=session_id,
+            metadata=metadata,
+            question_length=question_length
+        )
+        
+        self._write_audit_log(audit_entry)
+        
+        return audit_entry
+    
+    def log_data_access_many(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Log several data accesses with one batched file write.
+        
+        Args:
+            records: Keyword arguments for log_data_access(), one dict per access
+            
+        Returns:
+            List of audit entry dictionaries
+        """
+        if not self.enabled:
+            return []
+        
+        audit_entries = [self._build_data_access_entry(**record) for record in records]
+        self._write_audit_logs(audit_entries)
+        return audit_entries
+    
+    def _build_data_access_entry(
+        self,
+        user_id: str,
+        user_email: str,
+        user_role: str,
+        school_id: str,
+        action: str,
+        purpose: str,
+        student_id: Optional[str] = None,
+        classroom_id: Optional[str] = None,
+        grade_level: Optional[str] = None,
+        question: Optional[str] = None,
+        data_sources_accessed: Optional[List[str]] = None,
+        ip_address: Optional[str] = None,
+        session_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        question_length: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Build a data access audit entry (see log_data_access for the arguments)."""
+        if question_length is None:
+            question_length = len(question) if question else 0
+        
         audit_entry = {
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "event_type": AuditEventType.DATA_ACCESS.value,
@@ -323,7 +565,7 @@ class FERPAAuditLogger:
             "student_id": student_id,
             "classroom_id": classroom_id,
             "grade_level": grade_level,
-            "question_length": len(question) if question else 0,  # Don't log full question (may contain PII)
+            "question_length": question_length,  # Don't log full question (may contain PII)
             "data_sources": data_sources_accessed or [],
             "ip_address": ip_address,
             "session_id": session_id,
@@ -346,8 +588,6 @@ class FERPAAuditLogger:
             except (ValueError, TypeError):
                 pass
         
-        self._write_audit_log(audit_entry)
-        
         return audit_entry
     
     def log_harmful_content(
@@ -577,6 +817,28 @@ class FERPAAuditLogger:
         if self.log_to_file:
             self.logger.info(audit_json)
         
+        self._emit_to_stdout_and_sinks(audit_entry)
+    
+    def _write_audit_logs(self, audit_entries: List[Dict[str, Any]]):
+        """
+        Write several audit entries, batching the file write (see _write_audit_log).
+        
+        Args:
+            audit_entries: Audit entry dictionaries
+        """
+        if self.log_to_file:
+            audit_jsons = [json.dumps(entry, ensure_ascii=False, default=str) for entry in audit_entries]
+            if self._file_handler is not None:
+                self._file_handler.emit_many(audit_jsons)
+            else:
+                for audit_json in audit_jsons:
+                    self.logger.info(audit_json)
+        
+        for audit_entry in audit_entries:
+            self._emit_to_stdout_and_sinks(audit_entry)
+    
+    def _emit_to_stdout_and_sinks(self, audit_entry: Dict[str, Any]):
+        """Send an audit entry to stdout and the enabled external sinks."""
         # Log to stdout (structured logging)
         if self.log_to_stdout:
             # We use the module-level logger for stdout to avoid double-writing to the file
@@ -609,7 +871,7 @@ class FERPAAuditLogger:
         # Prepare event payload according to Splunk HEC json format
         payload: Dict[str, Any] = {
             "time": datetime.now(timezone.utc).timestamp(),
-            "host": os.getenv("HOSTNAME", "master-agent"),
+            "host": self.config.hostname,
             "source": self.splunk_source,
             "sourcetype": self.splunk_sourcetype,
             "event": audit_entry,
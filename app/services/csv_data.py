@@ -5,15 +5,38 @@ Loads assessment score exports from `data/` and provides utilities
 to filter records and compute PRE vs POST comparisons.
 """
 import csv
+import json
+import logging
 import os
+from dataclasses import dataclass
 from functools import lru_cache
 from typing import Dict, List, Any, Optional, Tuple
 
+import numpy as np
+
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
 
 # Default file name pattern (latest export can be passed explicitly)
 DEFAULT_FILE_NAME = "scores_export_2025-11-16.csv"
 
+# Parsed exports are cached next to the source as <file>.parsed.json so a cold
+# process skips the CSV parse. JSON rather than pickle: loading it cannot run code.
+# Bump the version when the row format changes.
+_SIDECAR_SUFFIX = ".parsed.json"
+_SIDECAR_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidDataFileError(ValueError):
+	"""Raised when a requested scores file is not a CSV inside DATA_DIR."""
+	pass
+
+
+# Identifying (non-metric) columns of the export; everything else is a metric count
+_BASE_COLUMNS = frozenset(["ID", "School", "Grade", "Assessment", "Total Students", "Test Type"])
+_BASE_KEYS = frozenset(["id", "school", "grade", "assessment", "total_students", "test_type"])
+
 
 def _to_int(value: str) -> int:
 	"""Convert CSV numeric field to int safely."""
@@ -23,43 +46,215 @@ def _to_int(value: str) -> int:
 		return 0
 
 
-@lru_cache(maxsize=4)
 def load_scores(file_name: str = DEFAULT_FILE_NAME) -> List[Dict[str, Any]]:
 	"""
 	Load the scores CSV into a list of dict rows.
 	Results are memoized per file name.
 	"""
-	file_path = file_name
-	if not os.path.isabs(file_path):
-		file_path = os.path.join(DATA_DIR, file_name)
+	return _parse_scores(file_name)[0]
+
+
+def load_metric_keys(file_name: str = DEFAULT_FILE_NAME) -> Tuple[str, ...]:
+	"""
+	Return the normalized metric keys of a scores export, in column order.
+	Resolved from the header when the file is parsed.
+	"""
+	return _parse_scores(file_name)[1]
+
+
+def resolve_data_file(file_name: str) -> str:
+	"""
+	Resolve a scores file name (a request parameter) to a CSV inside DATA_DIR.
 	
-	if not os.path.exists(file_path):
-		raise FileNotFoundError(f"Scores CSV not found: {file_path}")
+	Absolute paths, ".." segments and symlinks are resolved before the check, so
+	nothing outside DATA_DIR is ever read, or gets a cache file written next to it.
 	
+	Raises:
+		InvalidDataFileError: If the name does not resolve to a .csv inside DATA_DIR
+		FileNotFoundError: If the file does not exist
+	"""
+	data_dir = os.path.realpath(DATA_DIR)
+	file_path = os.path.realpath(os.path.join(data_dir, file_name))
+	if os.path.commonpath([data_dir, file_path]) != data_dir:
+		raise InvalidDataFileError(f"Scores file must be inside the data directory: {file_name}")
+	if not file_path.lower().endswith(".csv"):
+		raise InvalidDataFileError(f"Scores file must be a .csv export: {file_name}")
+	if not os.path.isfile(file_path):
+		raise FileNotFoundError(f"Scores CSV not found: {file_name}")
+	return file_path
+
+
+@lru_cache(maxsize=4)
+def _parse_scores(file_name: str) -> Tuple[List[Dict[str, Any]], Tuple[str, ...]]:
+	file_path = resolve_data_file(file_name)
+	sidecar_path = file_path + _SIDECAR_SUFFIX
+	parsed = _read_sidecar(file_path, sidecar_path)
+	if parsed is None:
+		parsed = _read_csv(file_path)
+		_write_sidecar(sidecar_path, parsed)
+	return parsed
+
+
+def _read_sidecar(file_path: str, sidecar_path: str) -> Optional[Tuple[List[Dict[str, Any]], Tuple[str, ...]]]:
+	"""Return the cached parse of file_path, or None if missing, stale or unreadable."""
+	try:
+		if os.path.getmtime(sidecar_path) < os.path.getmtime(file_path):
+			return None
+		with open(sidecar_path, "r", encoding="utf-8") as f:
+			payload = json.load(f)
+	except FileNotFoundError:
+		return None
+	except Exception as e:
+		logger.warning(f"Ignoring unreadable scores cache {sidecar_path}: {e}")
+		return None
+	if not isinstance(payload, dict) or payload.get("version") != _SIDECAR_VERSION:
+		return None
+	rows, metric_keys = payload.get("rows"), payload.get("metric_keys")
+	if not isinstance(rows, list) or not isinstance(metric_keys, list):
+		return None
+	return rows, tuple(metric_keys)
+
+
+def _write_sidecar(sidecar_path: str, parsed: Tuple[List[Dict[str, Any]], Tuple[str, ...]]) -> None:
+	"""Persist a parse result; failures (e.g. read-only data dir) are not fatal."""
+	rows, metric_keys = parsed
+	tmp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+	try:
+		with open(tmp_path, "w", encoding="utf-8") as f:
+			json.dump(
+				{"version": _SIDECAR_VERSION, "rows": rows, "metric_keys": list(metric_keys)},
+				f,
+				separators=(",", ":"),
+			)
+		os.replace(tmp_path, sidecar_path)
+	except OSError as e:
+		logger.warning(f"Could not write scores cache {sidecar_path}: {e}")
+		try:
+			os.remove(tmp_path)
+		except OSError:
+			pass
+
+
+def _read_csv(file_path: str) -> Tuple[List[Dict[str, Any]], Tuple[str, ...]]:
+	"""Parse a scores export into (rows, metric_keys)."""
 	with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
-		reader = csv.DictReader(f)
+		reader = csv.reader(f)
+		header = next(reader, [])
+		index = {name: i for i, name in enumerate(header)}
+		width = len(header)
+		
+		# Resolve column positions and normalized metric names once per file, not per row.
+		# All metric columns start after Test Type in this export.
+		metric_columns = [
+			(i, name.strip().lower().replace(" ", "_"))
+			for i, name in enumerate(header)
+			if name not in _BASE_COLUMNS
+		]
+		
+		def cell(values: List[str], name: str, default: Optional[str] = None) -> Optional[str]:
+			i = index.get(name)
+			return values[i] if i is not None and i < len(values) else default
+		
 		rows: List[Dict[str, Any]] = []
-		for row in reader:
+		for values in reader:
+			if not values:
+				continue  # csv.DictReader skips blank lines too
+			if len(values) < width:
+				values = values + [None] * (width - len(values))
+			
 			# Normalize and convert numeric fields
 			normalized: Dict[str, Any] = {
-				"id": row.get("ID"),
-				"school": row.get("School"),
-				"grade": row.get("Grade"),
-				"assessment": row.get("Assessment"),
-				"total_students": _to_int(row.get("Total Students", "0")),
-				"test_type": row.get("Test Type"),  # PRE or POST
+				"id": cell(values, "ID"),
+				"school": cell(values, "School"),
+				"grade": cell(values, "Grade"),
+				"assessment": cell(values, "Assessment"),
+				"total_students": _to_int(cell(values, "Total Students", "0")),
+				"test_type": cell(values, "Test Type"),  # PRE or POST
 			}
-			
-			# All metric columns start after Test Type in this export
-			for key, val in row.items():
-				if key in ["ID", "School", "Grade", "Assessment", "Total Students", "Test Type"]:
-					continue
-				metric_key = key.strip().lower().replace(" ", "_")
-				normalized[metric_key] = _to_int(val)
+			for i, metric_key in metric_columns:
+				normalized[metric_key] = _to_int(values[i])
 			
 			rows.append(normalized)
 	
-	return rows
+	return rows, tuple(metric_key for _, metric_key in metric_columns)
+
+
+@dataclass(frozen=True)
+class ScoreColumns:
+	"""
+	Column-oriented (struct-of-arrays) view of a scores export.
+	
+	String columns are lowercased so filters compare case-insensitively, and the
+	metric counts form one (rows x metric_keys) int64 matrix aligned with `rows`,
+	so filtering is a boolean mask and aggregation is a single axis-0 reduction.
+	"""
+	rows: Tuple[Dict[str, Any], ...]
+	school: np.ndarray
+	grade: np.ndarray
+	assessment: np.ndarray
+	test_type: np.ndarray
+	is_pre: np.ndarray
+	is_post: np.ndarray
+	total_students: np.ndarray
+	metric_keys: Tuple[str, ...]
+	metrics: np.ndarray
+	
+	def __len__(self) -> int:
+		return len(self.rows)
+
+
+def _lower_column(rows: List[Dict[str, Any]], key: str) -> np.ndarray:
+	return np.array([(r.get(key) or "").lower() for r in rows], dtype=object)
+
+
+def _int_column(rows: List[Dict[str, Any]], key: str) -> np.ndarray:
+	return np.fromiter((int(r.get(key, 0) or 0) for r in rows), dtype=np.int64, count=len(rows))
+
+
+@lru_cache(maxsize=4)
+def load_columns(file_name: str = DEFAULT_FILE_NAME) -> ScoreColumns:
+	"""
+	Load the scores CSV as columns (see ScoreColumns).
+	Results are memoized per file name.
+	"""
+	rows, metric_keys = _parse_scores(file_name)
+	if not rows:
+		metric_keys = ()
+	test_type = _lower_column(rows, "test_type")
+	return ScoreColumns(
+		rows=tuple(rows),
+		school=_lower_column(rows, "school"),
+		grade=_lower_column(rows, "grade"),
+		assessment=_lower_column(rows, "assessment"),
+		test_type=test_type,
+		is_pre=test_type == "pre",
+		is_post=test_type == "post",
+		total_students=_int_column(rows, "total_students"),
+		metric_keys=metric_keys,
+		metrics=np.array(
+			[[r[k] for k in metric_keys] for r in rows], dtype=np.int64
+		).reshape(len(rows), len(metric_keys)),
+	)
+
+
+def filter_mask(
+	cols: ScoreColumns,
+	school: Optional[str] = None,
+	grade: Optional[str] = None,
+	assessment: Optional[str] = None,
+	test_type: Optional[str] = None,
+) -> np.ndarray:
+	"""Boolean row mask equivalent to filter_records() with the same filters."""
+	mask = np.ones(len(cols), dtype=bool)
+	for column, value in (
+		(cols.school, school),
+		(cols.grade, grade),
+		(cols.assessment, assessment),
+		(cols.test_type, test_type),
+	):
+		if value:
+			mask &= column == value.lower()
+	return mask
 
 
 def filter_records(
@@ -70,30 +265,28 @@ def filter_records(
 	test_type: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
 	"""Filter rows by school, grade, and assessment if provided."""
-	result = []
-	for r in rows:
-		if school and (r.get("school") or "").lower() != school.lower():
-			continue
-		if grade and (r.get("grade") or "").lower() != grade.lower():
-			continue
-		if assessment and (r.get("assessment") or "").lower() != assessment.lower():
-			continue
-		if test_type and (r.get("test_type") or "").lower() != test_type.lower():
-			continue
-		result.append(r)
-	return result
-
-
-def _split_pre_post(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-	pre = [r for r in rows if (r.get("test_type") or "").upper() == "PRE"]
-	post = [r for r in rows if (r.get("test_type") or "").upper() == "POST"]
-	return pre, post
+	# Lowercase each filter once; only the provided filters are checked per row
+	active = [
+		(key, value.lower())
+		for key, value in (
+			("school", school),
+			("grade", grade),
+			("assessment", assessment),
+			("test_type", test_type),
+		)
+		if value
+	]
+	if not active:
+		return list(rows)
+	return [
+		r for r in rows
+		if all((r.get(key) or "").lower() == value for key, value in active)
+	]
 
 
 def _metric_keys(row: Dict[str, Any]) -> List[str]:
 	"""Return all metric keys present in a row (numeric fields only)."""
-	skip = {"id", "school", "grade", "assessment", "total_students", "test_type"}
-	return [k for k, v in row.items() if k not in skip and isinstance(v, int)]
+	return [k for k, v in row.items() if k not in _BASE_KEYS and isinstance(v, int)]
 
 
 def compute_prepost_comparison(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -104,28 +297,64 @@ def compute_prepost_comparison(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
 	if not rows:
 		return {"summary": {"total_pre": 0, "total_post": 0}, "metrics": {}, "notes": ["No matching records"]}
 	
-	pre_rows, post_rows = _split_pre_post(rows)
-	
 	# Gather metric keys from the first available row
 	sample = next((r for r in rows if r), None) or {}
 	metrics = _metric_keys(sample)
 	
-	def sum_metric(rows_local: List[Dict[str, Any]], key: str) -> int:
-		return sum(int(r.get(key, 0) or 0) for r in rows_local)
+	# Single pass: every metric of a row is added to its PRE or POST bucket at once.
+	# load_scores() already converted every numeric field to int.
+	buckets = {"PRE": [0] * len(metrics), "POST": [0] * len(metrics)}
+	totals = {"PRE": 0, "POST": 0}
+	counts = {"PRE": 0, "POST": 0}
+	for r in rows:
+		test_type = (r.get("test_type") or "").upper()
+		sums = buckets.get(test_type)
+		if sums is None:
+			continue
+		totals[test_type] += r["total_students"]
+		counts[test_type] += 1
+		for i, key in enumerate(metrics):
+			sums[i] += r[key]
+	
+	pre_sums, post_sums = buckets["PRE"], buckets["POST"]
+	return {
+		"summary": {
+			"total_pre": totals["PRE"],
+			"total_post": totals["POST"],
+			"rows_pre": counts["PRE"],
+			"rows_post": counts["POST"],
+		},
+		"metrics": {
+			key: {"pre": pre_val, "post": post_val, "delta": post_val - pre_val}
+			for key, pre_val, post_val in zip(metrics, pre_sums, post_sums)
+		},
+	}
+
+
+def compute_prepost_comparison_columns(cols: ScoreColumns, mask: np.ndarray) -> Dict[str, Any]:
+	"""
+	Columnar equivalent of compute_prepost_comparison() for the rows selected by mask.
+	All metrics are reduced at once with a masked axis-0 sum over the metrics matrix.
+	"""
+	if not mask.any():
+		return {"summary": {"total_pre": 0, "total_post": 0}, "metrics": {}, "notes": ["No matching records"]}
+	
+	pre_mask = mask & cols.is_pre
+	post_mask = mask & cols.is_post
 	
 	out: Dict[str, Any] = {
 		"summary": {
-			"total_pre": sum(int(r.get("total_students", 0)) for r in pre_rows),
-			"total_post": sum(int(r.get("total_students", 0)) for r in post_rows),
-			"rows_pre": len(pre_rows),
-			"rows_post": len(post_rows),
+			"total_pre": int(cols.total_students[pre_mask].sum()),
+			"total_post": int(cols.total_students[post_mask].sum()),
+			"rows_pre": int(pre_mask.sum()),
+			"rows_post": int(post_mask.sum()),
 		},
 		"metrics": {},
 	}
 	
-	for key in metrics:
-		pre_val = sum_metric(pre_rows, key)
-		post_val = sum_metric(post_rows, key)
+	pre_sums = cols.metrics[pre_mask].sum(axis=0).tolist()
+	post_sums = cols.metrics[post_mask].sum(axis=0).tolist()
+	for key, pre_val, post_val in zip(cols.metric_keys, pre_sums, post_sums):
 		out["metrics"][key] = {
 			"pre": pre_val,
 			"post": post_val,
@@ -135,6 +364,34 @@ def compute_prepost_comparison(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
 	return out
 
 
+def prepost_comparison(
+	school: Optional[str] = None,
+	grade: Optional[str] = None,
+	assessment: Optional[str] = None,
+	file_name: str = DEFAULT_FILE_NAME,
+) -> Dict[str, Any]:
+	"""
+	Filter and compute the PRE vs POST comparison in one step over the columnar store.
+	Results are memoized per filter combination; treat the returned dict as read-only.
+	"""
+	return _prepost_comparison_cached(_filter_key(school), _filter_key(grade), _filter_key(assessment), file_name)
+
+
+@lru_cache(maxsize=256)
+def _prepost_comparison_cached(
+	school: Optional[str],
+	grade: Optional[str],
+	assessment: Optional[str],
+	file_name: str,
+) -> Dict[str, Any]:
+	"""Memoized body of prepost_comparison(); dashboards re-poll the same filters."""
+	cols = load_columns(file_name=file_name)
+	return compute_prepost_comparison_columns(
+		cols,
+		filter_mask(cols, school=school, grade=grade, assessment=assessment),
+	)
+
+
 def summarize_rows(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
 	"""
 	Summarize a set of rows by summing each metric and total_students.
@@ -146,13 +403,55 @@ def summarize_rows(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
 	sums: Dict[str, int] = {k: 0 for k in metrics}
 	for r in rows:
 		for k in metrics:
-			sums[k] += int(r.get(k, 0) or 0)
+			sums[k] += r[k]
 	return {
-		"total_students": sum(int(r.get("total_students", 0)) for r in rows),
+		"total_students": sum(r["total_students"] for r in rows),
 		"metrics": sums,
 	}
 
 
+def summarize_columns(cols: ScoreColumns, mask: np.ndarray) -> Dict[str, Any]:
+	"""
+	Columnar equivalent of summarize_rows() for the rows selected by mask.
+	"""
+	if not mask.any():
+		return {"total_students": 0, "metrics": {}}
+	sums = cols.metrics[mask].sum(axis=0).tolist()
+	return {
+		"total_students": int(cols.total_students[mask].sum()),
+		"metrics": dict(zip(cols.metric_keys, sums)),
+	}
+
+
+def prepost_summaries(
+	grade: Optional[str] = None,
+	assessment: Optional[str] = None,
+	school: Optional[str] = None,
+	file_name: str = DEFAULT_FILE_NAME,
+) -> Dict[str, Any]:
+	"""
+	PRE and POST summaries plus their comparison for one filter, over the columnar store.
+	
+	Equivalent to filtering with filter_scores(test_type="pre"/"post") and passing the rows
+	to summarize_rows() / build_comparison_summary(), without materializing the rows.
+	
+	Returns:
+		Dict with "counts" (rows_pre/rows_post), "pre", "post" and "comparison"
+	"""
+	cols = load_columns(file_name=file_name)
+	mask = filter_mask(cols, school=school, grade=grade, assessment=assessment)
+	pre_mask = mask & cols.is_pre
+	post_mask = mask & cols.is_post
+	pre_summary = summarize_columns(cols, pre_mask)
+	post_summary = summarize_columns(cols, post_mask)
+	return {
+		"counts": {"rows_pre": int(pre_mask.sum()), "rows_post": int(post_mask.sum())},
+		"pre": pre_summary,
+		"post": post_summary,
+		"comparison": _compare_summaries(pre_summary, post_summary),
+	}
+
+
 def filter_scores(
 	grade: Optional[str] = None,
 	test_type: Optional[str] = None,
@@ -162,15 +461,40 @@ def filter_scores(
 ) -> List[Dict[str, Any]]:
 	"""
 	Load and filter scores in one step (convenience for agent).
+	Results are memoized per filter combination; the returned list is a fresh copy.
 	"""
-	rows = load_scores(file_name=file_name)
-	return filter_records(
-		rows,
-		school=school,
-		grade=grade,
-		assessment=assessment,
-		test_type=test_type,
-	)
+	return list(_filter_scores_cached(
+		_filter_key(grade),
+		_filter_key(test_type),
+		_filter_key(school),
+		_filter_key(assessment),
+		file_name,
+	))
+
+
+def _filter_key(value: Optional[str]) -> Optional[str]:
+	"""Normalize a filter value the way filter_records compares it (case-insensitive, falsy = no filter)."""
+	return value.lower() if value else None
+
+
+@lru_cache(maxsize=256)
+def _filter_scores_cached(
+	grade: Optional[str],
+	test_type: Optional[str],
+	school: Optional[str],
+	assessment: Optional[str],
+	file_name: str,
+) -> Tuple[Dict[str, Any], ...]:
+	"""Filter the (memoized) CSV rows with a column mask; cached so repeated pre/post lookups skip the scan."""
+	cols = load_columns(file_name=file_name)
+	mask = filter_mask(cols, school=school, grade=grade, assessment=assessment, test_type=test_type)
+	return tuple(cols.rows[i] for i in np.flatnonzero(mask))
+
+
+def clear_caches() -> None:
+	"""Drop every memoized parse, column store and filter result (e.g. after an export is replaced)."""
+	for cached in (_parse_scores, load_columns, _filter_scores_cached, _prepost_comparison_cached):
+		cached.cache_clear()
 
 
 def build_comparison_summary(
@@ -180,8 +504,11 @@ def build_comparison_summary(
 	"""
 	Produce a concise comparison summary object with pre, post, and delta per metric.
 	"""
-	pre_summary = summarize_rows(pre_rows)
-	post_summary = summarize_rows(post_rows)
+	return _compare_summaries(summarize_rows(pre_rows), summarize_rows(post_rows))
+
+
+def _compare_summaries(pre_summary: Dict[str, Any], post_summary: Dict[str, Any]) -> Dict[str, Any]:
+	"""Combine PRE and POST summaries (see summarize_rows) into a comparison object."""
 	# Union of metric keys
 	all_keys = set(pre_summary.get("metrics", {}).keys()) | set(post_summary.get("metrics", {}).keys())
 	metrics = {}
@@ -4,14 +4,44 @@ Data Router Service
 Determines which assessment data tables are needed based on educator questions.
 Uses keyword matching as a placeholder for more sophisticated NLP in the future.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from datetime import datetime, timedelta
+from functools import lru_cache, partial
+import asyncio
+import logging
 import re
 import os
 
+import numpy as np
+
 from ..models.data_models import AssessmentDataSet, EMTRecord, REALRecord, SELRecord, AggregatedAssessmentData
 from . import csv_data
 
+logger = logging.getLogger(__name__)
+
+# Number of placeholder records generated per source
+MOCK_RECORD_COUNT = 3
+
+
+def _mock_dates(base_date: datetime) -> List[datetime]:
+    """One placeholder assessment date per day starting at base_date."""
+    return [base_date + timedelta(days=i) for i in range(MOCK_RECORD_COUNT)]
+
+
+# SELRecord skill fields, in the order they are summarized
+SEL_SKILLS = (
+    "self_awareness",
+    "self_management",
+    "social_awareness",
+    "relationship_skills",
+    "responsible_decision_making",
+)
+
+
+def _keyword_re(keywords: Tuple[str, ...]) -> "re.Pattern[str]":
+    """One alternation over literal keywords (substring semantics, same as `keyword in text`)."""
+    return re.compile("|".join(map(re.escape, keywords)))
+
 
 class DataRouter:
     """
@@ -21,31 +51,44 @@ class DataRouter:
     TODO: Replace with more sophisticated NLP/ML-based routing once requirements are clearer.
     """
     
-    # Keyword mappings for data source identification
+    # Keyword mappings for data source identification (immutable tuples)
     # Based on the Master Agent architecture: REAL, EMT, and SEL Data
-    EMT_KEYWORDS = [
+    EMT_KEYWORDS = (
         "emotion", "emotion matching", "emt", "emotions", "emotional", "matching task",
         "emotion recognition", "feeling recognition", "emotion assignment"
-    ]
+    )
     
-    REAL_KEYWORDS = [
+    REAL_KEYWORDS = (
         "remote learning", "real", "distance learning", "online learning",
         "remote assessment", "learning assessment", "academic performance", 
         "real evaluation", "real assessment"
-    ]
+    )
     
-    SEL_KEYWORDS = [
+    SEL_KEYWORDS = (
         "sel", "social emotional", "social-emotional", "sel assignment", "sel assessment",
         "self-awareness", "self-management", "social awareness",
         "relationship skills", "responsible decision", "sel skills", "sel data"
-    ]
+    )
+    
+    # One precompiled scan per source instead of a substring test per keyword.
+    # Kept separate per source: a single alternation would consume overlapping
+    # keywords ("social emotional" hides "emotion") and drop a source.
+    _EMT_RE = _keyword_re(EMT_KEYWORDS)
+    _REAL_RE = _keyword_re(REAL_KEYWORDS)
+    _SEL_RE = _keyword_re(SEL_KEYWORDS)
     
     def __init__(self):
         """Initialize the data router."""
         # Allow temporarily disabling sources via environment variable.
         # Example: DISABLE_SOURCES="EMT,REAL"
         disabled = os.getenv("DISABLE_SOURCES", "")
-        self.disabled_sources = {s.strip().upper() for s in disabled.split(",") if s.strip()}
+        self.disabled_sources = frozenset(s.strip().upper() for s in disabled.split(",") if s.strip())
+        # Resolved once so matching never re-checks disabled_sources
+        self._enabled_sources = tuple(
+            (source, pattern)
+            for source, pattern in (("EMT", self._EMT_RE), ("REAL", self._REAL_RE), ("SEL", self._SEL_RE))
+            if source not in self.disabled_sources
+        )
     
     def determine_data_sources(self, question: str) -> List[str]:
         """
@@ -59,27 +102,130 @@ class DataRouter:
         Returns:
             List of data source identifiers (e.g., ["EMT", "SEL", "REAL"])
         """
-        question_lower = question.lower()
-        sources = []
-        
-        # Check for EMT keywords
-        if "EMT" not in self.disabled_sources and any(keyword in question_lower for keyword in self.EMT_KEYWORDS):
-            sources.append("EMT")
-        
-        # Check for REAL keywords
-        if "REAL" not in self.disabled_sources and any(keyword in question_lower for keyword in self.REAL_KEYWORDS):
-            sources.append("REAL")
+        # Normalize (lowercase, collapse whitespace) so repeated questions share a cache entry
+        normalized = " ".join(question.lower().split())
+        return list(self._match_data_sources(normalized, self._enabled_sources))
+    
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _match_data_sources(question_lower: str, enabled_sources: tuple) -> tuple:
+        """
+        Keyword-match a normalized question to data sources (memoized).
         
-        # Check for SEL keywords
-        if "SEL" not in self.disabled_sources and any(keyword in question_lower for keyword in self.SEL_KEYWORDS):
-            sources.append("SEL")
+        Args:
+            question_lower: Lowercased, whitespace-collapsed question
+            enabled_sources: (source, keyword pattern) pairs not excluded via DISABLE_SOURCES
+            
+        Returns:
+            Tuple of data source identifiers
+        """
+        # Check each enabled source's keywords
+        sources = [source for source, pattern in enabled_sources if pattern.search(question_lower)]
         
         # Default: if no specific source is identified, include all sources
         if not sources:
-            # Very general question - include all three data sources
-            sources = [s for s in ["EMT", "REAL", "SEL"] if s not in self.disabled_sources]
+            # Very general question - include all enabled data sources
+            sources = [source for source, _ in enabled_sources]
+        
+        return tuple(sources)  # Each source appears at most once by construction
+    
+    def _fetch_emt(self, base_date: datetime, student_id: str = None) -> List[EMTRecord]:
+        """Fetch EMT records."""
+        # TODO: Replace with actual SQL query to EMT table
+        scores = (0.75 + 0.05 * np.arange(MOCK_RECORD_COUNT)).tolist()
+        dates = _mock_dates(base_date)
+        # Placeholder values are known-valid, so skip per-record validation
+        return [
+            EMTRecord.model_construct(
+                student_id=student_id or "student_001",
+                assessment_date=date,
+                emotion_score=score,
+                metadata={"placeholder": True, "source": "EMT"}
+            )
+            for date, score in zip(dates, scores)
+        ]
+    
+    def _fetch_real(self, base_date: datetime, student_id: str = None) -> List[REALRecord]:
+        """Fetch REAL records."""
+        # TODO: Replace with actual SQL query to REAL table
+        scores = (0.70 + 0.03 * np.arange(MOCK_RECORD_COUNT)).tolist()
+        dates = _mock_dates(base_date)
+        return [
+            REALRecord.model_construct(
+                student_id=student_id or "student_001",
+                assessment_date=date,
+                learning_score=score,
+                metadata={"placeholder": True, "source": "REAL"}
+            )
+            for date, score in zip(dates, scores)
+        ]
+    
+    def _fetch_sel(self, base_date: datetime, student_id: str = None) -> List[SELRecord]:
+        """Fetch SEL records."""
+        # TODO: Replace with actual SQL query to SEL Data table
+        return [
+            SELRecord.model_construct(
+                student_id=student_id or "student_001",
+                assessment_date=date,
+                assignment_id=f"sel_assignment_{i+1}",
+                self_awareness=0.80,
+                self_management=0.75,
+                social_awareness=0.85,
+                relationship_skills=0.78,
+                responsible_decision_making=0.82,
+                sel_score=0.80,
+                observations="Positive social-emotional development observed",
+                metadata={"placeholder": True, "source": "SEL"}
+            )
+            for i, date in enumerate(_mock_dates(base_date))
+        ]
+    
+    def _fetch_aggregated(self, grade_level: str = None, school: str = None) -> Optional[AggregatedAssessmentData]:
+        """Fetch aggregated pre/post data from the CSV export (None if nothing matches)."""
+        try:
+            # Filter based on available parameters
+            # Note: student_id is not supported by the aggregated CSV, only grade/school
+            cols = csv_data.load_columns()
+            mask = csv_data.filter_mask(cols, grade=grade_level, school=school)
+            
+            if mask.any():
+                comp = csv_data.compute_prepost_comparison_columns(cols, mask)
+                return AggregatedAssessmentData(
+                    summary=comp["summary"],
+                    metrics=comp["metrics"],
+                    metadata={"source": "CSV", "file": csv_data.DEFAULT_FILE_NAME}
+                )
+        except Exception as e:
+            # Log error but don't fail the whole request
+            logger.error(f"Error fetching CSV data: {e}")
+        return None
+    
+    def _plan_fetch(
+        self,
+        data_sources: List[str],
+        grade_level: str = None,
+        student_id: str = None,
+        school: str = None
+    ) -> Dict[str, Callable[[], Any]]:
+        """
+        Map AssessmentDataSet fields to the independent source fetches they need.
+        
+        Returns:
+            Dict of dataset field name -> zero-argument fetch callable
+        """
+        base_date = datetime.now() - timedelta(days=30)
+        plan: Dict[str, Callable[[], Any]] = {}
+        
+        if "EMT" in data_sources and "EMT" not in self.disabled_sources:
+            plan["emt_data"] = partial(self._fetch_emt, base_date, student_id)
+        if "REAL" in data_sources and "REAL" not in self.disabled_sources:
+            plan["real_data"] = partial(self._fetch_real, base_date, student_id)
+        if "SEL" in data_sources and "SEL" not in self.disabled_sources:
+            plan["sel_data"] = partial(self._fetch_sel, base_date, student_id)
         
-        return list(set(sources))  # Remove duplicates
+        # Aggregated CSV data is always fetched so the agent has access to the real data provided by the user
+        plan["aggregated_data"] = partial(self._fetch_aggregated, grade_level, school)
+        return plan
     
     def fetch_data(
         self,
@@ -105,78 +251,36 @@ class DataRouter:
         Returns:
             AssessmentDataSet containing data from requested sources
         """
-        dataset = AssessmentDataSet()
-        base_date = datetime.now() - timedelta(days=30)
-        
-        # Generate mock data based on requested sources
-        if "EMT" in data_sources and "EMT" not in self.disabled_sources:
-            # TODO: Replace with actual SQL query to EMT table
-            dataset.emt_data = [
-                EMTRecord(
-                    student_id=student_id or "student_001",
-                    assessment_date=base_date + timedelta(days=i),
-                    emotion_score=0.75 + (i * 0.05),
-                    metadata={"placeholder": True, "source": "EMT"}
-                )
-                for i in range(3)
-            ]
+        plan = self._plan_fetch(data_sources, grade_level, student_id, school)
+        return AssessmentDataSet(**{field: fetch() for field, fetch in plan.items()})
+    
+    async def afetch_data(
+        self,
+        data_sources: List[str],
+        grade_level: str = None,
+        student_id: str = None,
+        classroom_id: str = None,
+        school: str = None
+    ) -> AssessmentDataSet:
+        """
+        Async variant of fetch_data for use from request handlers.
         
-        if "REAL" in data_sources and "REAL" not in self.disabled_sources:
-            # TODO: Replace with actual SQL query to REAL table
-            dataset.real_data = [
-                REALRecord(
-                    student_id=student_id or "student_001",
-                    assessment_date=base_date + timedelta(days=i),
-                    learning_score=0.70 + (i * 0.03),
-                    metadata={"placeholder": True, "source": "REAL"}
-                )
-                for i in range(3)
-            ]
+        Each source is fetched concurrently in a worker thread, so latency is the
+        slowest source rather than the sum, and the event loop stays free.
         
-        if "SEL" in data_sources and "SEL" not in self.disabled_sources:
-            # TODO: Replace with actual SQL query to SEL Data table
-            dataset.sel_data = [
-                SELRecord(
-                    student_id=student_id or "student_001",
-                    assessment_date=base_date + timedelta(days=i),
-                    assignment_id=f"sel_assignment_{i+1}",
-                    self_awareness=0.80,
-                    self_management=0.75,
-                    social_awareness=0.85,
-                    relationship_skills=0.78,
-                    responsible_decision_making=0.82,
-                    sel_score=0.80,
-                    observations="Positive social-emotional development observed",
-                    metadata={"placeholder": True, "source": "SEL"}
-                )
-                for i in range(3)
-            ]
-            
-        # Fetch Aggregated CSV Data (Always fetch if available, or could be conditional)
-        # For now, we fetch it to ensure the agent has access to the real data provided by the user.
-        try:
-            # Filter based on available parameters
-            # Note: student_id is not supported by the aggregated CSV, only grade/school
-            csv_rows = csv_data.filter_scores(
-                grade=grade_level,
-                school=school,
-            )
+        Args:
+            data_sources: List of data source identifiers
+            grade_level: Optional grade level filter
+            student_id: Optional student ID filter
+            classroom_id: Optional classroom ID filter
+            school: Optional school filter
             
-            if csv_rows:
-                comp = csv_data.compute_prepost_comparison(csv_rows)
-                dataset.aggregated_data = AggregatedAssessmentData(
-                    summary=comp["summary"],
-                    metrics=comp["metrics"],
-                    metadata={"source": "CSV", "file": csv_data.DEFAULT_FILE_NAME}
-                )
-        except Exception as e:
-            # Log error but don't fail the whole request
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Error fetching CSV data: {e}")
-
-        
-        return dataset
+        Returns:
+            AssessmentDataSet containing data from requested sources
+        """
+        plan = self._plan_fetch(data_sources, grade_level, student_id, school)
+        results = await asyncio.gather(*(asyncio.to_thread(fetch) for fetch in plan.values()))
+        return AssessmentDataSet(**dict(zip(plan, results)))
     
     def format_data_for_llm(self, dataset: AssessmentDataSet) -> Dict[str, Any]:
         """
@@ -196,72 +300,56 @@ class DataRouter:
         }
         
         if dataset.emt_data:
-            formatted["emt_summary"] = {
-                "record_count": len(dataset.emt_data),
-                "average_score": sum(r.emotion_score for r in dataset.emt_data) / len(dataset.emt_data),
-                "latest_score": max(dataset.emt_data, key=lambda x: x.assessment_date).emotion_score,
-                "records": [
-                    {
-                        "student_id": r.student_id,
-                        "date": r.assessment_date.isoformat(),
-                        "score": r.emotion_score
-                    }
-                    for r in dataset.emt_data
-                ]
-            }
+            formatted["emt_summary"] = self._summarize_scores(dataset.emt_data, "emotion_score")
         
         if dataset.real_data:
-            formatted["real_summary"] = {
-                "record_count": len(dataset.real_data),
-                "average_score": sum(r.learning_score for r in dataset.real_data) / len(dataset.real_data),
-                "latest_score": max(dataset.real_data, key=lambda x: x.assessment_date).learning_score,
-                "records": [
-                    {
-                        "student_id": r.student_id,
-                        "date": r.assessment_date.isoformat(),
-                        "score": r.learning_score
-                    }
-                    for r in dataset.real_data
-                ]
-            }
+            formatted["real_summary"] = self._summarize_scores(dataset.real_data, "learning_score")
         
         if dataset.sel_data:
-            # Aggregate SEL scores
-            sel_scores = {}
-            for record in dataset.sel_data:
-                for skill in ["self_awareness", "self_management", "social_awareness", 
-                             "relationship_skills", "responsible_decision_making"]:
-                    value = getattr(record, skill)
+            # Aggregate SEL scores, per-skill averages and records in a single pass
+            skill_count = len(SEL_SKILLS)
+            skill_sums = [0] * skill_count
+            skill_counts = [0] * skill_count
+            sel_total = 0
+            sel_n = 0
+            records = []
+            for r in dataset.sel_data:
+                skills = (
+                    r.self_awareness,
+                    r.self_management,
+                    r.social_awareness,
+                    r.relationship_skills,
+                    r.responsible_decision_making,
+                )
+                for i, value in enumerate(skills):
                     if value is not None:
-                        if skill not in sel_scores:
-                            sel_scores[skill] = []
-                        sel_scores[skill].append(value)
-            
-            # Calculate average SEL score if available
-            sel_score_values = [r.sel_score for r in dataset.sel_data if r.sel_score is not None]
+                        skill_sums[i] += value
+                        skill_counts[i] += 1
+                if r.sel_score is not None:
+                    sel_total += r.sel_score
+                    sel_n += 1
+                records.append({
+                    "student_id": r.student_id,
+                    "assignment_id": r.assignment_id,
+                    "date": r.assessment_date.isoformat(),
+                    "self_awareness": skills[0],
+                    "self_management": skills[1],
+                    "social_awareness": skills[2],
+                    "relationship_skills": skills[3],
+                    "responsible_decision_making": skills[4],
+                    "sel_score": r.sel_score,
+                    "observations": r.observations
+                })
             
             formatted["sel_summary"] = {
                 "record_count": len(dataset.sel_data),
                 "average_scores": {
-                    skill: sum(values) / len(values) 
-                    for skill, values in sel_scores.items()
-                } if sel_scores else {},
-                "average_sel_score": sum(sel_score_values) / len(sel_score_values) if sel_score_values else None,
-                "records": [
-                    {
-                        "student_id": r.student_id,
-                        "assignment_id": r.assignment_id,
-                        "date": r.assessment_date.isoformat(),
-                        "self_awareness": r.self_awareness,
-                        "self_management": r.self_management,
-                        "social_awareness": r.social_awareness,
-                        "relationship_skills": r.relationship_skills,
-                        "responsible_decision_making": r.responsible_decision_making,
-                        "sel_score": r.sel_score,
-                        "observations": r.observations
-                    }
-                    for r in dataset.sel_data
-                ]
+                    skill: skill_sums[i] / skill_counts[i]
+                    for i, skill in enumerate(SEL_SKILLS)
+                    if skill_counts[i]
+                },
+                "average_sel_score": sel_total / sel_n if sel_n else None,
+                "records": records
             }
         
         if dataset.aggregated_data:
@@ -272,4 +360,36 @@ class DataRouter:
             }
         
         return formatted
+    
+    @staticmethod
+    def _summarize_scores(data: List[Any], score_attr: str) -> Dict[str, Any]:
+        """
+        Summarize EMT/REAL records (count, average, latest, records) in one pass.
+        
+        Args:
+            data: Non-empty list of EMTRecord or REALRecord
+            score_attr: Name of the score attribute ("emotion_score" or "learning_score")
+            
+        Returns:
+            Summary dictionary for format_data_for_llm
+        """
+        total = 0
+        latest = data[0]
+        records = []
+        for r in data:
+            score = getattr(r, score_attr)
+            total += score
+            if r.assessment_date > latest.assessment_date:
+                latest = r
+            records.append({
+                "student_id": r.student_id,
+                "date": r.assessment_date.isoformat(),
+                "score": score
+            })
+        return {
+            "record_count": len(data),
+            "average_score": total / len(data),
+            "latest_score": getattr(latest, score_attr),
+            "records": records
+        }
 
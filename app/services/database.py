@@ -4,34 +4,169 @@ Database Service
 Handles database connections and queries for data access control.
 Uses SQLite for development/testing.
 """
+import asyncio
 import sqlite3
 import os
-from typing import List, Optional, Dict, Any
+import threading
+import time
+from typing import List, Optional, Dict, Any, Callable, Awaitable, Iterable, Tuple
 from contextlib import contextmanager
+from functools import wraps
 import logging
+from cachetools import TTLCache
 
 logger = logging.getLogger(__name__)
 
 # Database file path
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "access_control.db")
 
+# Bump when init_database() gains new DDL; stored in the database's PRAGMA user_version
+SCHEMA_VERSION = 2
 
-@contextmanager
-def get_db_connection():
-    """Get database connection with automatic cleanup."""
+# Roster lookups change on hour-scales, so cache them briefly instead of hitting SQLite per request.
+# The cache is per process, so entries are keyed by the shared roster_version row: triggers bump it
+# on every roster write (from any process or tool), and invalidate_access_cache() bumps it for
+# POST /admin/cache/invalidate. Each process re-reads the version (off the event loop) at most
+# every ROSTER_VERSION_CHECK_SECONDS, so writes from other processes are seen within that window;
+# writes made by this process are seen on the next lookup.
+ACCESS_CACHE_TTL_SECONDS = 60
+ACCESS_CACHE_MAX_ENTRIES = 10000
+ROSTER_VERSION_CHECK_SECONDS = 2
+_access_cache: TTLCache = TTLCache(maxsize=ACCESS_CACHE_MAX_ENTRIES, ttl=ACCESS_CACHE_TTL_SECONDS)
+_access_cache_version: Optional[int] = None
+_access_cache_checked_at: Optional[float] = None  # time.monotonic() of the last version read
+
+
+def _select_roster_version() -> int:
+    """Blocking query behind _current_roster_version()."""
+    with get_db_connection() as conn:
+        return conn.execute("SELECT version FROM roster_version WHERE id = 1").fetchone()[0]
+
+
+def _expire_roster_version() -> None:
+    """Make the next lookup re-read the roster version (after a write from this process)."""
+    global _access_cache_checked_at
+    _access_cache_checked_at = None
+
+
+async def _current_roster_version() -> int:
+    """
+    Return the shared roster version, dropping this process's cache when it has moved.
+    
+    Between checks the last version read is reused, so a cache hit never touches SQLite.
+    """
+    global _access_cache_version, _access_cache_checked_at
+    now = time.monotonic()
+    if (
+        _access_cache_version is not None
+        and _access_cache_checked_at is not None
+        and now - _access_cache_checked_at < ROSTER_VERSION_CHECK_SECONDS
+    ):
+        return _access_cache_version
+    
+    version = await asyncio.to_thread(_select_roster_version)
+    if version != _access_cache_version:
+        # Entries are keyed by version, so older ones can never hit again; free them now
+        _access_cache.clear()
+        _access_cache_version = version
+    _access_cache_checked_at = now
+    return version
+
+
+def _ttl_cached(func: Callable[[str], Awaitable[Any]]) -> Callable[[str], Awaitable[Any]]:
+    """
+    Memoize a single-argument async lookup in the shared access cache.
+    
+    Cached results are shared between callers and must be treated as read-only.
+    The roster version is read before the query, so a result that raced a roster
+    write is stored under the old version and never served after it.
+    """
+    @wraps(func)
+    async def wrapper(key: str):
+        cache_key = (func.__name__, key, await _current_roster_version())
+        try:
+            return _access_cache[cache_key]
+        except KeyError:
+            pass
+        result = await func(key)
+        _access_cache[cache_key] = result
+        return result
+    return wrapper
+
+
+def invalidate_access_cache() -> int:
+    """
+    Invalidate cached roster lookups in every process.
+    
+    Roster writes already do this through the roster_version triggers; this is for
+    changes the triggers cannot see (e.g. a restored database file). This process's
+    cache is cleared now; other workers drop theirs at their next version check.
+    
+    Returns:
+        Number of cache entries removed from this process's cache
+    """
+    with get_db_connection() as conn:
+        conn.execute("UPDATE roster_version SET version = version + 1 WHERE id = 1")
+        conn.commit()
+    removed = len(_access_cache)
+    _access_cache.clear()
+    _expire_roster_version()
+    logger.info(f"Access cache invalidated ({removed} local entries)")
+    return removed
+
+
+# One long-lived connection per thread (sqlite3 connections must not be shared across
+# threads); reopened after a fork so gunicorn workers never inherit the parent's handle.
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a connection configured for concurrent readers."""
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+    conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block on the writer
+    conn.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, far fewer fsyncs
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+@contextmanager
+def get_db_connection():
+    """
+    Get this thread's shared database connection.
+    
+    The connection is opened on first use and kept open; an exception inside the
+    block rolls back any uncommitted changes instead of closing the connection.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.pid != os.getpid():
+        conn = _local.conn = _connect()
+        _local.pid = os.getpid()
     try:
         yield conn
-    finally:
-        conn.close()
+    except BaseException:
+        conn.rollback()
+        raise
 
 
-def init_database():
-    """Initialize database schema."""
+def init_database(force: bool = False):
+    """
+    Initialize database schema.
+    
+    Skipped when the database already records SCHEMA_VERSION, so worker startup
+    costs one PRAGMA read instead of re-running the DDL.
+    
+    Args:
+        force: Re-run the DDL even if the schema is up to date
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
+        current_version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if current_version >= SCHEMA_VERSION and not force:
+            logger.debug(f"Database schema v{current_version} already initialized at {DB_PATH}")
+            return
+        
         # Educator-Classroom assignments
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS educator_classrooms (
@@ -79,28 +214,153 @@ def init_database():
             CREATE INDEX IF NOT EXISTS idx_student_classrooms_school 
             ON student_classrooms(school_id)
         """)
+        # Covering indexes: the per-user context lookups are answered from the index alone
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_educator_classrooms_cov 
+            ON educator_classrooms(educator_id, school_id, classroom_id)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_student_classrooms_cov 
+            ON student_classrooms(student_id, school_id, classroom_id)
+        """)
+        
+        # Shared roster version behind the access cache; any roster write bumps it
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS roster_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO roster_version (id, version) VALUES (1, 0)")
+        for table in ("educator_classrooms", "student_classrooms"):
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE roster_version SET version = version + 1 WHERE id = 1;
+                    END
+                """)
         
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         conn.commit()
-        logger.info(f"Database initialized at {DB_PATH}")
+        logger.info(f"Database initialized at {DB_PATH} (schema v{SCHEMA_VERSION})")
 
 
-async def get_educator_classrooms(educator_id: str) -> List[str]:
+def _select_context(table: str, id_column: str, user_id: str) -> Dict[str, Any]:
+    """Blocking query behind get_educator_context() / get_student_context()."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        # ORDER BY id keeps insertion order (what the old per-field queries returned)
+        cursor.execute(
+            f"SELECT school_id, classroom_id FROM {table} WHERE {id_column} = ? ORDER BY id",
+            (user_id,)
+        )
+        rows = cursor.fetchall()
+    return {
+        "school_id": rows[0]["school_id"] if rows else None,
+        "classroom_ids": [row["classroom_id"] for row in rows],
+    }
+
+
+@_ttl_cached
+async def get_educator_context(educator_id: str) -> Dict[str, Any]:
     """
-    Get all classroom IDs for an educator.
+    Get an educator's school and classrooms with a single query.
     
     Args:
         educator_id: Educator's user ID
         
     Returns:
-        List of classroom IDs
+        Dict with "school_id" (or None if not found) and "classroom_ids"
+    """
+    return await asyncio.to_thread(_select_context, "educator_classrooms", "educator_id", educator_id)
+
+
+@_ttl_cached
+async def get_student_context(student_id: str) -> Dict[str, Any]:
+    """
+    Get a student's school and classrooms with a single query.
+    
+    Args:
+        student_id: Student's ID
+        
+    Returns:
+        Dict with "school_id" (or None if not found) and "classroom_ids"
     """
+    return await asyncio.to_thread(_select_context, "student_classrooms", "student_id", student_id)
+
+
+def _select_access_context(educator_id: str, student_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Blocking query behind get_access_context(): both rosters in one UNION ALL."""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
-            "SELECT classroom_id FROM educator_classrooms WHERE educator_id = ?",
-            (educator_id,)
+            """
+            SELECT 'educator' AS side, id, school_id, classroom_id
+            FROM educator_classrooms WHERE educator_id = ?
+            UNION ALL
+            SELECT 'student' AS side, id, school_id, classroom_id
+            FROM student_classrooms WHERE student_id = ?
+            ORDER BY side, id
+            """,
+            (educator_id, student_id)
         )
-        return [row["classroom_id"] for row in cursor.fetchall()]
+        rows = cursor.fetchall()
+    contexts = {side: {"school_id": None, "classroom_ids": []} for side in ("educator", "student")}
+    for row in rows:
+        context = contexts[row["side"]]
+        if context["school_id"] is None:
+            context["school_id"] = row["school_id"]
+        context["classroom_ids"].append(row["classroom_id"])
+    return contexts["educator"], contexts["student"]
+
+
+async def get_access_context(educator_id: str, student_id: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Get the educator's and the student's contexts (see get_educator_context) together.
+    
+    Uses the cached per-user contexts when present; when neither is cached both are
+    read with a single query and cached individually.
+    
+    Args:
+        educator_id: Educator's user ID
+        student_id: Student's ID
+        
+    Returns:
+        (educator_context, student_context)
+    """
+    version = await _current_roster_version()
+    educator_key = (get_educator_context.__name__, educator_id, version)
+    student_key = (get_student_context.__name__, student_id, version)
+    educator_context = _access_cache.get(educator_key)
+    student_context = _access_cache.get(student_key)
+    
+    if educator_context is None and student_context is None:
+        educator_context, student_context = await asyncio.to_thread(
+            _select_access_context, educator_id, student_id
+        )
+        _access_cache[educator_key] = educator_context
+        _access_cache[student_key] = student_context
+    elif educator_context is None:
+        educator_context = await get_educator_context(educator_id)
+    elif student_context is None:
+        student_context = await get_student_context(student_id)
+    
+    return educator_context, student_context
+
+
+async def get_educator_classrooms(educator_id: str) -> List[str]:
+    """
+    Get all classroom IDs for an educator.
+    
+    Args:
+        educator_id: Educator's user ID
+        
+    Returns:
+        List of classroom IDs
+    """
+    return (await get_educator_context(educator_id))["classroom_ids"]
 
 
 async def get_student_classrooms(student_id: str) -> List[str]:
@@ -113,13 +373,7 @@ async def get_student_classrooms(student_id: str) -> List[str]:
     Returns:
         List of classroom IDs
     """
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT classroom_id FROM student_classrooms WHERE student_id = ?",
-            (student_id,)
-        )
-        return [row["classroom_id"] for row in cursor.fetchall()]
+    return (await get_student_context(student_id))["classroom_ids"]
 
 
 async def get_student_school(student_id: str) -> Optional[str]:
@@ -132,14 +386,7 @@ async def get_student_school(student_id: str) -> Optional[str]:
     Returns:
         School ID or None if not found
     """
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT school_id FROM student_classrooms WHERE student_id = ? LIMIT 1",
-            (student_id,)
-        )
-        row = cursor.fetchone()
-        return row["school_id"] if row else None
+    return (await get_student_context(student_id))["school_id"]
 
 
 async def get_educator_school(educator_id: str) -> Optional[str]:
@@ -152,42 +399,55 @@ async def get_educator_school(educator_id: str) -> Optional[str]:
     Returns:
         School ID or None if not found
     """
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT school_id FROM educator_classrooms WHERE educator_id = ? LIMIT 1",
-            (educator_id,)
-        )
-        row = cursor.fetchone()
-        return row["school_id"] if row else None
+    return (await get_educator_context(educator_id))["school_id"]
 
 
-def add_educator_classroom(educator_id: str, classroom_id: str, school_id: str, role: str = "teacher"):
-    """Add educator-classroom assignment."""
+def add_many_educator_classrooms(rows: Iterable[Tuple[str, str, str, str]]):
+    """
+    Add educator-classroom assignments in a single transaction.
+    
+    Args:
+        rows: (educator_id, classroom_id, school_id, role) tuples
+    """
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
+        conn.executemany(
             """
             INSERT OR IGNORE INTO educator_classrooms (educator_id, classroom_id, school_id, role)
             VALUES (?, ?, ?, ?)
             """,
-            (educator_id, classroom_id, school_id, role)
+            rows
         )
-        conn.commit()
+        conn.commit()  # The roster_version triggers invalidate cached lookups
+    _expire_roster_version()  # Seen by this process's next lookup, not after the check interval
 
 
-def add_student_classroom(student_id: str, classroom_id: str, school_id: str):
-    """Add student-classroom assignment."""
+def add_many_student_classrooms(rows: Iterable[Tuple[str, str, str]]):
+    """
+    Add student-classroom assignments in a single transaction.
+    
+    Args:
+        rows: (student_id, classroom_id, school_id) tuples
+    """
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
+        conn.executemany(
             """
             INSERT OR IGNORE INTO student_classrooms (student_id, classroom_id, school_id)
             VALUES (?, ?, ?)
             """,
-            (student_id, classroom_id, school_id)
+            rows
         )
-        conn.commit()
+        conn.commit()  # The roster_version triggers invalidate cached lookups
+    _expire_roster_version()  # Seen by this process's next lookup, not after the check interval
+
+
+def add_educator_classroom(educator_id: str, classroom_id: str, school_id: str, role: str = "teacher"):
+    """Add educator-classroom assignment."""
+    add_many_educator_classrooms([(educator_id, classroom_id, school_id, role)])
+
+
+def add_student_classroom(student_id: str, classroom_id: str, school_id: str):
+    """Add student-classroom assignment."""
+    add_many_student_classrooms([(student_id, classroom_id, school_id)])
 
 
 # Initialize database on module import
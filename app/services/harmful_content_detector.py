@@ -51,6 +51,42 @@ class HarmType(Enum):
     SYSTEM_MANIPULATION = "system_manipulation"
 
 
+# Placeholder entries in the pattern table that never count as a match
+_PLACEHOLDER_PATTERNS = {r'\b\*\*\*\b'}
+
+CompiledPatternTable = List[Tuple["HarmType", "HarmSeverity", str, "re.Pattern[str]"]]
+
+
+def _compile_pattern_table(mapping: Dict) -> CompiledPatternTable:
+    """
+    Compile a PATTERN_MAPPING into (harm_type, severity, pattern, regex) entries.
+    
+    Each distinct pattern string is compiled once, even when several harm types share
+    the same pattern list; placeholder patterns are dropped.
+    """
+    compiled: Dict[str, "re.Pattern[str]"] = {}
+    table = []
+    for harm_type, (patterns, severity) in mapping.items():
+        for pattern in patterns:
+            if pattern in _PLACEHOLDER_PATTERNS:
+                continue
+            if pattern not in compiled:
+                compiled[pattern] = re.compile(pattern, re.IGNORECASE)
+            table.append((harm_type, severity, pattern, compiled[pattern]))
+    return table
+
+
+def _compile_prefilter(table: CompiledPatternTable) -> "re.Pattern[str]":
+    """
+    Union every pattern in the table into one regex.
+    
+    A text with no match for the union cannot match any individual pattern, so
+    benign text is cleared with one search instead of a scan per pattern.
+    """
+    unique = dict.fromkeys(pattern for _, _, pattern, _ in table)
+    return re.compile("|".join(f"(?:{pattern})" for pattern in unique), re.IGNORECASE)
+
+
 class HarmfulContentDetector:
     """
     Detects potentially harmful content in questions and responses.
@@ -147,6 +183,10 @@ class HarmfulContentDetector:
         HarmType.SYSTEM_MANIPULATION: (SYSTEM_MANIPULATION_PATTERNS, HarmSeverity.MEDIUM),
     }
     
+    # Compiled once at import and shared by every instance and call
+    COMPILED_PATTERNS = _compile_pattern_table(PATTERN_MAPPING)
+    _PREFILTER_RE = _compile_prefilter(COMPILED_PATTERNS)
+    
     def __init__(self, enabled: bool = True):
         """
         Initialize the harmful content detector.
@@ -184,6 +224,52 @@ class HarmfulContentDetector:
                 "requires_alert": bool
             }
         """
+        return self.detect_harmful_content_batch(
+            texts=[text],
+            contexts=[context],
+            user_id=user_id,
+            school_id=school_id
+        )[0]
+    
+    def detect_harmful_content_batch(
+        self,
+        texts: List[str],
+        contexts: List[str],
+        user_id: Optional[str] = None,
+        school_id: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Detect potentially harmful content in several texts in one call.
+        
+        All texts are scanned against the precompiled pattern table (COMPILED_PATTERNS)
+        in one call, so a question and its response share a single dispatch.
+        
+        Args:
+            texts: Texts to analyze
+            contexts: Context for each text, aligned with texts ("question", "response", etc.)
+            user_id: User ID for logging
+            school_id: School ID for logging
+            
+        Returns:
+            List of detection result dictionaries (see detect_harmful_content), one per text
+        """
+        if len(texts) != len(contexts):
+            raise ValueError("texts and contexts must have the same length")
+        
+        return [
+            self._scan(text, context, self.COMPILED_PATTERNS, user_id, school_id)
+            for text, context in zip(texts, contexts)
+        ]
+    
+    def _scan(
+        self,
+        text: str,
+        context: str,
+        compiled: CompiledPatternTable,
+        user_id: Optional[str] = None,
+        school_id: Optional[str] = None
+    ) -> Dict:
+        """Run the compiled pattern table over a single text and build its detection result."""
         if not self.enabled or not text:
             return {
                 "is_harmful": False,
@@ -194,36 +280,39 @@ class HarmfulContentDetector:
             }
         
         text_lower = text.lower()
+        
+        # Fast path: nothing in the table can match (the common, benign case)
+        if compiled is self.COMPILED_PATTERNS and not self._PREFILTER_RE.search(text_lower):
+            return {
+                "is_harmful": False,
+                "severity": None,
+                "harm_types": [],
+                "matches": [],
+                "requires_alert": False
+            }
+        
         matches = []
         harm_types_found = []
         max_severity = None
         
         # Check each harm type pattern
-        for harm_type, (patterns, severity) in self.PATTERN_MAPPING.items():
-            for pattern in patterns:
-                regex = re.compile(pattern, re.IGNORECASE)
-                found_matches = regex.finditer(text_lower)
+        for harm_type, severity, pattern, regex in compiled:
+            for match in regex.finditer(text_lower):
+                matches.append({
+                    "harm_type": harm_type.value,
+                    "severity": severity.value,
+                    "pattern": pattern,
+                    "matched_text": match.group(0),
+                    "start": match.start(),
+                    "end": match.end()
+                })
+                
+                if harm_type not in harm_types_found:
+                    harm_types_found.append(harm_type)
                 
-                for match in found_matches:
-                    # Skip placeholder patterns
-                    if pattern == r'\b\*\*\*\b':
-                        continue
-                    
-                    matches.append({
-                        "harm_type": harm_type.value,
-                        "severity": severity.value,
-                        "pattern": pattern,
-                        "matched_text": match.group(0),
-                        "start": match.start(),
-                        "end": match.end()
-                    })
-                    
-                    if harm_type not in harm_types_found:
-                        harm_types_found.append(harm_type)
-                    
-                    # Track maximum severity
-                    if max_severity is None or self._severity_value(severity) > self._severity_value(max_severity):
-                        max_severity = severity
+                # Track maximum severity
+                if max_severity is None or self._severity_value(severity) > self._severity_value(max_severity):
+                    max_severity = severity
         
         is_harmful = len(matches) > 0
         requires_alert = max_severity in [HarmSeverity.HIGH, HarmSeverity.CRITICAL] if max_severity else False
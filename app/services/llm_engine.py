@@ -3,7 +3,8 @@ LLM Engine Service
 
 Handles prompt construction and LLM API calls for generating natural language responses.
 """
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
+import asyncio
 import json
 import os
 import logging
@@ -51,6 +52,8 @@ class LLMEngine:
         self.model_name = model_name or ("gemini-1.5-pro" if provider == "gemini" else "gpt-4")
         self.model = None
         self.gemini_enabled = False
+        # Models bound to a fixed system instruction, keyed by that instruction
+        self._system_models: Dict[str, Any] = {}
         
         # Initialize Gemini API client if available and API key is configured
         if TestMode.is_enabled():
@@ -127,6 +130,118 @@ class LLMEngine:
         
         return "\n".join(prompt_parts)
     
+    @staticmethod
+    def _generation_config(max_tokens: int) -> Dict[str, Any]:
+        """Gemini generation parameters (as a dict for SDK compatibility)."""
+        return {
+            "max_output_tokens": max_tokens,
+            "temperature": 0.7,  # Balanced creativity vs consistency
+            "top_p": 0.95,
+            "top_k": 40,
+        }
+    
+    def _chat_model(self, system_instruction: Optional[str]):
+        """
+        Return the Gemini model to use for a chat call.
+        
+        A fixed system instruction is passed to Gemini via system_instruction= rather than
+        being concatenated into every prompt, so the constant prefix is sent once per model
+        and can be cached provider-side. One model is built per distinct instruction.
+        
+        Args:
+            system_instruction: Optional system instruction for the conversation
+            
+        Returns:
+            GenerativeModel instance
+        """
+        if not system_instruction:
+            return self.model
+        model = self._system_models.get(system_instruction)
+        if model is None:
+            model = genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
+            self._system_models[system_instruction] = model
+        return model
+    
+    def _mock_fallback(self, question: str, data_summary: Dict[str, Any]) -> str:
+        """Build the mock response used when Gemini is unavailable or fails."""
+        logger.debug("Using mock response (Gemini API not available or failed)")
+        
+        # Determine which data sources were used
+        data_sources = []
+        if data_summary.get("emt_summary"):
+            data_sources.append("EMT")
+        if data_summary.get("real_summary"):
+            data_sources.append("REAL")
+        if data_summary.get("sel_summary"):
+            data_sources.append("SEL")
+        
+        # Generate a contextual mock response
+        return self._generate_mock_response(question, data_summary, data_sources)
+    
+    @staticmethod
+    def _read_response(response: Any) -> Tuple[Optional[str], Optional[Exception]]:
+        """
+        Extract the text of a Gemini call outcome.
+        
+        Args:
+            response: Gemini response, the exception the call raised, or None if
+                Gemini was not called
+            
+        Returns:
+            (stripped text or None, exception or None)
+        """
+        if response is None:
+            return None, None
+        if isinstance(response, Exception):
+            return None, response
+        try:
+            # .text raises when the response has no candidates (e.g. blocked by safety filters)
+            text = response.text
+        except Exception as e:
+            return None, e
+        return (text.strip() if text else None), None
+    
+    def _finish_response(self, response: Any, question: str, data_summary: Dict[str, Any]) -> str:
+        """
+        Turn the outcome of a generate_response call into the answer, falling back to the mock.
+        
+        Shared by generate_response and agenerate_response so they differ only in how
+        they call Gemini; see _read_response for what response may be.
+        """
+        text, error = self._read_response(response)
+        if text:
+            logger.debug("Successfully generated response from Gemini API")
+            return text
+        if error is not None:
+            logger.error(f"Error calling Gemini API: {str(error)}. Falling back to mock response.")
+        elif response is not None:
+            logger.warning("Gemini API returned empty response, falling back to mock")
+        
+        # Fallback to mock response if Gemini is not available or failed
+        return self._mock_fallback(question, data_summary)
+    
+    def _finish_chat_response(self, response: Any) -> str:
+        """
+        Turn the outcome of a chat call into the reply shown to the user.
+        
+        Shared by generate_chat_response and agenerate_chat_response; see
+        _read_response for what response may be.
+        """
+        text, error = self._read_response(response)
+        if text:
+            logger.debug("Successfully generated chat response from Gemini API")
+            return text
+        if error is not None:
+            logger.error(f"Error calling Gemini API for chat: {str(error)}")
+            return "I encountered an error processing your request. Please try again."
+        if response is not None:
+            logger.warning("Gemini API returned empty response for chat")
+            return "I apologize, but I'm unable to generate a response at this time. Please try again."
+        
+        # Fallback if Gemini is not available
+        logger.warning("Gemini API not available for chat endpoint")
+        return "Chat functionality requires Gemini API configuration. Please contact your administrator."
+    
     def generate_response(
         self,
         question: str,
@@ -149,58 +264,58 @@ class LLMEngine:
         """
         prompt = self.build_prompt(question, data_summary)
         
-        # Try to use Gemini API if enabled
+        response = None
         if self.gemini_enabled and self.model:
+            logger.debug(f"Generating response with Gemini API (model: {self.model_name})")
             try:
-                logger.debug(f"Generating response with Gemini API (model: {self.model_name})")
-                
-                # Configure generation parameters
-                # Create generation config as a dictionary for compatibility
-                generation_config = {
-                    "max_output_tokens": max_tokens,
-                    "temperature": 0.7,  # Balanced creativity vs consistency
-                    "top_p": 0.95,
-                    "top_k": 40,
-                }
-                
-                # Generate response from Gemini
                 response = self.model.generate_content(
                     prompt,
-                    generation_config=generation_config
+                    generation_config=self._generation_config(max_tokens)
                 )
-                
-                if response and response.text:
-                    response_text = response.text.strip()
-                    logger.debug("Successfully generated response from Gemini API")
-                    return response_text
-                else:
-                    logger.warning("Gemini API returned empty response, falling back to mock")
-                    
             except Exception as e:
-                logger.error(f"Error calling Gemini API: {str(e)}. Falling back to mock response.")
-                # Fall through to mock response
+                response = e
         
-        # Fallback to mock response if Gemini is not available or failed
-        logger.debug("Using mock response (Gemini API not available or failed)")
+        return self._finish_response(response, question, data_summary)
+    
+    async def agenerate_response(
+        self,
+        question: str,
+        data_summary: Dict[str, Any],
+        max_tokens: int = 500
+    ) -> str:
+        """
+        Async variant of generate_response that does not block the event loop.
         
-        # Determine which data sources were used
-        data_sources = []
-        if data_summary.get("emt_summary"):
-            data_sources.append("EMT")
-        if data_summary.get("real_summary"):
-            data_sources.append("REAL")
-        if data_summary.get("sel_summary"):
-            data_sources.append("SEL")
+        Uses the Gemini SDK's native async client (generate_content_async).
         
-        # Generate a contextual mock response
-        mock_response = self._generate_mock_response(question, data_summary, data_sources)
+        Args:
+            question: Educator's natural language question
+            data_summary: Formatted data summary from data_router
+            max_tokens: Maximum tokens for the response
+            
+        Returns:
+            Generated natural language response
+        """
+        prompt = self.build_prompt(question, data_summary)
+        
+        response = None
+        if self.gemini_enabled and self.model:
+            logger.debug(f"Generating response with Gemini API (model: {self.model_name})")
+            try:
+                response = await self.model.generate_content_async(
+                    prompt,
+                    generation_config=self._generation_config(max_tokens)
+                )
+            except Exception as e:
+                response = e
         
-        return mock_response
+        return self._finish_response(response, question, data_summary)
     
     def generate_chat_response(
         self,
         conversation: List[str],
-        max_tokens: int = 500
+        max_tokens: int = 500,
+        system_instruction: Optional[str] = None
     ) -> str:
         """
         Generate a chat response using conversation history.
@@ -211,6 +326,8 @@ class LLMEngine:
         Args:
             conversation: List of conversation strings (system instruction, history, current message)
             max_tokens: Maximum tokens for the response
+            system_instruction: Optional fixed system instruction, sent via Gemini's
+                system_instruction parameter instead of as part of the prompt
             
         Returns:
             Generated natural language response
@@ -218,42 +335,52 @@ class LLMEngine:
         # Join conversation into a single prompt
         prompt = "\n".join(conversation)
         
-        # Try to use Gemini API if enabled
+        response = None
         if self.gemini_enabled and self.model:
+            logger.debug(f"Generating chat response with Gemini API (model: {self.model_name})")
             try:
-                logger.debug(f"Generating chat response with Gemini API (model: {self.model_name})")
-                
-                # Configure generation parameters
-                generation_config = {
-                    "max_output_tokens": max_tokens,
-                    "temperature": 0.7,
-                    "top_p": 0.95,
-                    "top_k": 40,
-                }
-                
-                # Generate response from Gemini
-                response = self.model.generate_content(
+                response = self._chat_model(system_instruction).generate_content(
                     prompt,
-                    generation_config=generation_config
+                    generation_config=self._generation_config(max_tokens)
                 )
-                
-                if response and response.text:
-                    response_text = response.text.strip()
-                    logger.debug("Successfully generated chat response from Gemini API")
-                    return response_text
-                else:
-                    logger.warning("Gemini API returned empty response for chat")
-                    return "I apologize, but I'm unable to generate a response at this time. Please try again."
-                    
             except Exception as e:
-                logger.error(f"Error calling Gemini API for chat: {str(e)}")
-                return "I encountered an error processing your request. Please try again."
+                response = e
         
-        # Fallback if Gemini is not available
-        logger.warning("Gemini API not available for chat endpoint")
-        return "Chat functionality requires Gemini API configuration. Please contact your administrator."
-
+        return self._finish_chat_response(response)
     
+    async def agenerate_chat_response(
+        self,
+        conversation: List[str],
+        max_tokens: int = 500,
+        system_instruction: Optional[str] = None
+    ) -> str:
+        """
+        Async variant of generate_chat_response that does not block the event loop.
+        
+        Args:
+            conversation: List of conversation strings (system instruction, history, current message)
+            max_tokens: Maximum tokens for the response
+            system_instruction: Optional fixed system instruction, sent via Gemini's
+                system_instruction parameter instead of as part of the prompt
+            
+        Returns:
+            Generated natural language response
+        """
+        prompt = "\n".join(conversation)
+        
+        response = None
+        if self.gemini_enabled and self.model:
+            logger.debug(f"Generating chat response with Gemini API (model: {self.model_name})")
+            try:
+                response = await self._chat_model(system_instruction).generate_content_async(
+                    prompt,
+                    generation_config=self._generation_config(max_tokens)
+                )
+            except Exception as e:
+                response = e
+        
+        return self._finish_chat_response(response)
+
     def _generate_mock_response(
         self,
         question: str,
@@ -365,3 +492,62 @@ class LLMEngine:
         
         return " ".join(response_parts)
 
+
+
+class ConcurrencyLimitedLLMEngine:
+    """
+    LLMEngine front end that bounds how many Gemini calls are in flight.
+    
+    Gemini has no batched generate endpoint, so collecting requests into batches
+    would only add latency; a semaphore gives the same back-pressure, and a request
+    that finds a free slot starts immediately.
+    
+    Drop-in replacement for LLMEngine on app.state (used by /ask, /agent/ask and
+    /chat): the async generate methods keep their signatures and every other
+    attribute is delegated to the wrapped engine.
+    """
+    
+    def __init__(self, engine: LLMEngine, max_concurrency: int):
+        """
+        Initialize the limiter.
+        
+        Args:
+            engine: LLMEngine that performs the actual calls
+            max_concurrency: Maximum number of LLM calls in flight at once
+        """
+        self.engine = engine
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes not defined here (gemini_enabled, build_prompt, ...)
+        return getattr(self.engine, name)
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Return the semaphore for the running event loop (a new one if the loop changed)."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+    
+    async def agenerate_response(
+        self,
+        question: str,
+        data_summary: Dict[str, Any],
+        max_tokens: int = 500
+    ) -> str:
+        """Same contract as LLMEngine.agenerate_response, run once a slot is free."""
+        async with self._get_semaphore():
+            return await self.engine.agenerate_response(question, data_summary, max_tokens)
+    
+    async def agenerate_chat_response(
+        self,
+        conversation: List[str],
+        max_tokens: int = 500,
+        system_instruction: Optional[str] = None
+    ) -> str:
+        """Same contract as LLMEngine.agenerate_chat_response, run once a slot is free."""
+        async with self._get_semaphore():
+            return await self.engine.agenerate_chat_response(conversation, max_tokens, system_instruction)
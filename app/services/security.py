@@ -6,17 +6,45 @@ and validation functions.
 """
 import re
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, NamedTuple
 from pydantic import ValidationError
 
+from ..models.query_models import AskRequest
+
 logger = logging.getLogger(__name__)
 
 
+def _compile_alternation(patterns: List[str]) -> "re.Pattern[str]":
+    """
+    Combine patterns into one case-insensitive alternation (one C-level scan per input).
+    
+    Each pattern is wrapped in a named group ``p<index>`` so the matching entry can be
+    recovered with _matched_pattern() for logging.
+    """
+    return re.compile(
+        "|".join(f"(?P<p{i}>{pattern})" for i, pattern in enumerate(patterns)),
+        re.IGNORECASE | re.DOTALL
+    )
+
+
+def _matched_pattern(patterns: List[str], match: "re.Match[str]") -> str:
+    """Return the source pattern that produced a match from _compile_alternation()."""
+    return patterns[int(match.lastgroup[1:])]
+
+
 class SecurityError(Exception):
     """Custom exception for security violations."""
     pass
 
 
+class SanitizedAsk(NamedTuple):
+    """Validated fields of an AskRequest."""
+    question: str
+    student_id: Optional[str]
+    classroom_id: Optional[str]
+    grade_level: Optional[str]
+
+
 class InputSanitizer:
     """
     Sanitizes and validates user input to prevent injection attacks.
@@ -64,6 +92,14 @@ class InputSanitizer:
         'prompt': ['<', '>', '{', '}', '[', ']'],
     }
     
+    # Precompiled at import so each field is checked with a single regex pass
+    _PROMPT_INJECTION_RE = _compile_alternation(PROMPT_INJECTION_PATTERNS)
+    _SQL_INJECTION_RE = _compile_alternation(SQL_INJECTION_PATTERNS)
+    _WHITESPACE_RE = re.compile(r'\s+')
+    _IDENTIFIER_RE = re.compile(r'[A-Za-z0-9_.-]+')
+    _GRADE_LEVEL_RE = re.compile(r'Grade\s+\d{1,2}', re.IGNORECASE)
+    _GRADE_LEVEL_LOOSE_RE = re.compile(r'[A-Za-z]+\s*\d{1,2}')
+    
     @classmethod
     def sanitize_question(
         cls,
@@ -99,28 +135,23 @@ class InputSanitizer:
             raise SecurityError(f"Question too long (maximum {max_length} characters)")
         
         # Check for prompt injection patterns
-        question_lower = question.lower()
-        for pattern in cls.PROMPT_INJECTION_PATTERNS:
-            if re.search(pattern, question_lower, re.IGNORECASE):
-                logger.warning(f"Prompt injection attempt detected: {pattern}")
-                raise SecurityError(
-                    "Invalid input detected. Please rephrase your question."
-                )
+        match = cls._PROMPT_INJECTION_RE.search(question)
+        if match:
+            logger.warning(f"Prompt injection attempt detected: {_matched_pattern(cls.PROMPT_INJECTION_PATTERNS, match)}")
+            raise SecurityError(
+                "Invalid input detected. Please rephrase your question."
+            )
         
         # Check for SQL injection patterns (defense in depth)
-        for pattern in cls.SQL_INJECTION_PATTERNS:
-            if re.search(pattern, question_lower, re.IGNORECASE):
-                logger.warning(f"SQL injection attempt detected: {pattern}")
-                raise SecurityError(
-                    "Invalid input detected. Please rephrase your question."
-                )
-        
-        # Remove or escape potentially dangerous characters for prompt context
-        # Replace newlines with spaces to prevent prompt manipulation
-        question = question.replace('\r\n', ' ').replace('\n', ' ').replace('\r', ' ')
+        match = cls._SQL_INJECTION_RE.search(question)
+        if match:
+            logger.warning(f"SQL injection attempt detected: {_matched_pattern(cls.SQL_INJECTION_PATTERNS, match)}")
+            raise SecurityError(
+                "Invalid input detected. Please rephrase your question."
+            )
         
-        # Normalize multiple spaces
-        question = re.sub(r'\s+', ' ', question).strip()
+        # Collapse newlines (prompt manipulation) and repeated whitespace into single spaces
+        question = cls._WHITESPACE_RE.sub(' ', question).strip()
         
         return question
     
@@ -157,19 +188,18 @@ class InputSanitizer:
         if len(identifier) > max_length:
             raise SecurityError(f"{field_name} too long (maximum {max_length} characters)")
         
-        # Only allow alphanumeric, hyphens, underscores, and dots
-        if not re.match(r'^[A-Za-z0-9_.-]+$', identifier):
+        # Only allow alphanumeric, hyphens, underscores, and dots (plain ASCII alnum skips the regex)
+        if not (identifier.isascii() and identifier.isalnum()) and not cls._IDENTIFIER_RE.fullmatch(identifier):
             raise SecurityError(
                 f"{field_name} contains invalid characters. "
                 "Only letters, numbers, hyphens, underscores, and dots are allowed."
             )
         
         # Check for SQL injection patterns
-        identifier_lower = identifier.lower()
-        for pattern in cls.SQL_INJECTION_PATTERNS:
-            if re.search(pattern, identifier_lower):
-                logger.warning(f"SQL injection attempt in {field_name}: {pattern}")
-                raise SecurityError(f"Invalid {field_name} format")
+        match = cls._SQL_INJECTION_RE.search(identifier)
+        if match:
+            logger.warning(f"SQL injection attempt in {field_name}: {_matched_pattern(cls.SQL_INJECTION_PATTERNS, match)}")
+            raise SecurityError(f"Invalid {field_name} format")
         
         return identifier
     
@@ -196,15 +226,54 @@ class InputSanitizer:
         grade_level = grade_level.strip()
         
         # Validate format: "Grade N" or "Grade NN" or similar
-        if not re.match(r'^Grade\s+\d{1,2}$', grade_level, re.IGNORECASE):
+        if not cls._GRADE_LEVEL_RE.fullmatch(grade_level):
             # Allow some flexibility but be strict
-            if not re.match(r'^[A-Za-z]+\s*\d{1,2}$', grade_level):
+            if not cls._GRADE_LEVEL_LOOSE_RE.fullmatch(grade_level):
                 raise SecurityError(
                     "Invalid grade level format. Expected format: 'Grade 1'"
                 )
         
         return grade_level
     
+    @classmethod
+    def sanitize_ask_request(cls, ask_request: AskRequest) -> SanitizedAsk:
+        """
+        Sanitize every user-supplied field of an /ask request in one call.
+        
+        Args:
+            ask_request: Incoming AskRequest
+            
+        Returns:
+            SanitizedAsk tuple of (question, student_id, classroom_id, grade_level)
+            
+        Raises:
+            SecurityError: If any field is invalid (all violations are reported together)
+        """
+        errors = []
+        question = student_id = classroom_id = grade_level = None
+        
+        try:
+            question = cls.sanitize_question(ask_request.question)
+        except SecurityError as e:
+            errors.append(str(e))
+        try:
+            student_id = cls.sanitize_identifier(ask_request.student_id, field_name="student_id")
+        except SecurityError as e:
+            errors.append(str(e))
+        try:
+            classroom_id = cls.sanitize_identifier(ask_request.classroom_id, field_name="classroom_id")
+        except SecurityError as e:
+            errors.append(str(e))
+        try:
+            grade_level = cls.sanitize_grade_level(ask_request.grade_level)
+        except SecurityError as e:
+            errors.append(str(e))
+        
+        if errors:
+            raise SecurityError("; ".join(errors))
+        
+        return SanitizedAsk(question, student_id, classroom_id, grade_level)
+    
     @classmethod
     def sanitize_dict_structure(cls, data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -243,11 +312,10 @@ class PromptInjectionDetector:
         Returns:
             Tuple of (is_malicious, reason)
         """
-        text_lower = text.lower()
-        
-        for pattern in InputSanitizer.PROMPT_INJECTION_PATTERNS:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                return True, f"Suspicious pattern detected: {pattern}"
+        match = InputSanitizer._PROMPT_INJECTION_RE.search(text)
+        if match:
+            pattern = _matched_pattern(InputSanitizer.PROMPT_INJECTION_PATTERNS, match)
+            return True, f"Suspicious pattern detected: {pattern}"
         
         return False, None
     
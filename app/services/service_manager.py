@@ -14,6 +14,13 @@ from typing import Optional
 import signal
 import sys
 from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+
+from fastapi import Request
+
+if TYPE_CHECKING:
+    from .data_router import DataRouter
+    from .llm_engine import LLMEngine
 
 logger = logging.getLogger(__name__)
 
@@ -183,6 +190,37 @@ def setup_signal_handlers(app):
     logger.info("Signal handlers registered for graceful shutdown")
 
 
+def init_app_services(app):
+    """
+    Construct the shared request-path services and store them on app.state.
+    
+    Done at startup rather than at import so loading app.main stays cheap
+    (the LLM SDK client and health checker are only built when the server starts).
+    """
+    from ..config import get_settings
+    from .data_router import DataRouter
+    from .llm_engine import ConcurrencyLimitedLLMEngine, LLMEngine
+    from .security_health_check import SecurityHealthCheck
+    
+    app.state.data_router = DataRouter()
+    llm_engine = LLMEngine()
+    max_concurrency = get_settings().llm_max_concurrency
+    app.state.llm_engine = (
+        ConcurrencyLimitedLLMEngine(llm_engine, max_concurrency) if max_concurrency > 0 else llm_engine
+    )
+    app.state.health_checker = SecurityHealthCheck()
+
+
+def get_data_router(request: Request) -> "DataRouter":
+    """Dependency returning the DataRouter built by init_app_services()."""
+    return request.app.state.data_router
+
+
+def get_llm_engine(request: Request) -> "LLMEngine":
+    """Dependency returning the LLM engine built by init_app_services()."""
+    return request.app.state.llm_engine
+
+
 @asynccontextmanager
 async def lifespan(app):
     """
@@ -192,6 +230,8 @@ async def lifespan(app):
     """
     # Startup
     logger.info("Service starting...")
+    init_app_services(app)
+    
     service_manager = get_service_manager()
     service_manager.start()
     
@@ -6,7 +6,7 @@ external services or production data sources.
 """
 import os
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -17,25 +17,36 @@ class TestMode:
     """
     ENV_FLAG = "TEST_MODE"
 
+    # Parsed on first use; the environment does not change after startup
+    _enabled: Optional[bool] = None
+
     @classmethod
     def is_enabled(cls) -> bool:
-        return os.getenv(cls.ENV_FLAG, "false").lower() == "true"
+        if cls._enabled is None:
+            cls._enabled = os.getenv(cls.ENV_FLAG, "false").lower() == "true"
+        return cls._enabled
+
+    @classmethod
+    def reset_cache(cls) -> None:
+        """Forget the cached flag (for tests that change TEST_MODE at runtime)."""
+        cls._enabled = None
 
     @classmethod
     def describe(cls) -> Dict[str, Any]:
         enabled = cls.is_enabled()
+        env = os.environ
         return {
             "enabled": enabled,
             "behaviors": {
-                "llm_engine_mock": True if enabled else False,
-                "external_api_calls_disabled": True if enabled else False,
+                "llm_engine_mock": enabled,
+                "external_api_calls_disabled": enabled,
                 "safe_audit_logging": True,  # writes to configured local file
                 "deterministic_mocks": True,
             },
             "env": {
-                "TEST_MODE": os.getenv(cls.ENV_FLAG, "false"),
-                "GEMINI_API_KEY_set": bool(os.getenv("GEMINI_API_KEY")),
-                "AUDIT_LOG_FILE": os.getenv("AUDIT_LOG_FILE", "audit.log"),
+                "TEST_MODE": env.get(cls.ENV_FLAG, "false"),
+                "GEMINI_API_KEY_set": bool(env.get("GEMINI_API_KEY")),
+                "AUDIT_LOG_FILE": env.get("AUDIT_LOG_FILE", "audit.log"),
             },
         }
 
@@ -1,11 +1,52 @@
 import requests
+from requests.adapters import HTTPAdapter
 import sys
 import json
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
 BASE_URL = "http://localhost:8000"
 ASK_ENDPOINT = f"{BASE_URL}/agent/ask"
 
+# (connect, read) timeouts in seconds
+REQUEST_TIMEOUT = (3.05, 30)
+
+# The /agent/ask body has a fixed shape, so only the (JSON-escaped) question is formatted in.
+# Optional fields can be added to the template if needed, e.g. "grade_level", "student_id".
+ASK_PAYLOAD_TEMPLATE = '{{"question": {question}}}'
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# One keep-alive connection to the server is reused across questions
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=0))
+
+SPINNER_FRAMES = "|/-\\"
+SPINNER_INTERVAL_SECONDS = 0.1
+
+
+@contextmanager
+def thinking_indicator():
+    """Animate a "Thinking..." spinner on a daemon thread while the body blocks on HTTP."""
+    done = threading.Event()
+
+    def spin():
+        frame = 0
+        while not done.wait(SPINNER_INTERVAL_SECONDS if frame else 0):
+            print(f"Thinking... {SPINNER_FRAMES[frame % len(SPINNER_FRAMES)]}", end="\r", flush=True)
+            frame += 1
+
+    spinner = threading.Thread(target=spin, daemon=True)
+    spinner.start()
+    try:
+        yield
+    finally:
+        done.set()
+        spinner.join()
+        # Clear "Thinking..."
+        print(" " * 20, end="\r")
+
+
 def main():
     print("-" * 50)
     print("Master Chatbot - Interactive Client")
@@ -16,8 +57,8 @@ def main():
 
     # Check if server is running
     try:
-        requests.get(f"{BASE_URL}/health")
-    except requests.exceptions.ConnectionError:
+        SESSION.get(f"{BASE_URL}/health", timeout=REQUEST_TIMEOUT)
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
         print(f"Error: Could not connect to server at {BASE_URL}")
         print("Please ensure 'start_server.ps1' is running in another terminal.")
         sys.exit(1)
@@ -34,20 +75,11 @@ def main():
                 break
 
             # Prepare request payload
-            payload = {
-                "question": question,
-                # Optional fields can be added here if needed
-                # "grade_level": "Grade 1",
-                # "student_id": "student_001"
-            }
-
-            print("Thinking...", end="\r")
-            
-            # Send request
-            response = requests.post(ASK_ENDPOINT, json=payload)
-            
-            # Clear "Thinking..."
-            print(" " * 20, end="\r")
+            payload = ASK_PAYLOAD_TEMPLATE.format(question=json.dumps(question)).encode("utf-8")
+
+            # Send request (the spinner keeps moving while we wait for the answer)
+            with thinking_indicator():
+                response = SESSION.post(ASK_ENDPOINT, data=payload, headers=JSON_HEADERS, timeout=REQUEST_TIMEOUT)
 
             if response.status_code == 200:
                 data = response.json()
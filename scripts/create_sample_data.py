@@ -3,7 +3,7 @@ Sample Data Generator for Access Control
 
 Creates sample educator-classroom and student-classroom assignments for testing.
 """
-from app.services.database import add_educator_classroom, add_student_classroom
+from app.services.database import add_many_educator_classrooms, add_many_student_classrooms
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,25 +22,23 @@ def create_sample_data():
         - Classroom 2B: Educator Dave, Students 16-20
     """
     
-    # School 1 - Classroom 1A
-    add_educator_classroom("educator_alice", "classroom_1a", "school_1", "teacher")
-    for i in range(1, 6):
-        add_student_classroom(f"student_{i:03d}", "classroom_1a", "school_1")
+    classrooms = [
+        # (educator, classroom, school, student numbers)
+        ("educator_alice", "classroom_1a", "school_1", range(1, 6)),
+        ("educator_bob", "classroom_1b", "school_1", range(6, 11)),
+        ("educator_carol", "classroom_2a", "school_2", range(11, 16)),
+        ("educator_dave", "classroom_2b", "school_2", range(16, 21)),
+    ]
     
-    # School 1 - Classroom 1B
-    add_educator_classroom("educator_bob", "classroom_1b", "school_1", "teacher")
-    for i in range(6, 11):
-        add_student_classroom(f"student_{i:03d}", "classroom_1b", "school_1")
-    
-    # School 2 - Classroom 2A
-    add_educator_classroom("educator_carol", "classroom_2a", "school_2", "teacher")
-    for i in range(11, 16):
-        add_student_classroom(f"student_{i:03d}", "classroom_2a", "school_2")
-    
-    # School 2 - Classroom 2B
-    add_educator_classroom("educator_dave", "classroom_2b", "school_2", "teacher")
-    for i in range(16, 21):
-        add_student_classroom(f"student_{i:03d}", "classroom_2b", "school_2")
+    add_many_educator_classrooms(
+        (educator, classroom, school, "teacher")
+        for educator, classroom, school, _ in classrooms
+    )
+    add_many_student_classrooms(
+        (f"student_{i:03d}", classroom, school)
+        for _, classroom, school, students in classrooms
+        for i in students
+    )
     
     logger.info("Sample data created successfully")
     print("✓ Sample data created:")
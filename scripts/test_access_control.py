@@ -22,25 +22,29 @@ async def test_database():
     print("Testing Database Queries")
     print("="*60)
     
+    # The four lookups are independent, so run them concurrently
+    educator_classrooms, student_classrooms, student_school, educator_school = await asyncio.gather(
+        get_educator_classrooms("educator_alice"),
+        get_student_classrooms("student_001"),
+        get_student_school("student_001"),
+        get_educator_school("educator_alice")
+    )
+    
     # Test educator classrooms
     print("\n1. Educator Alice's classrooms:")
-    classrooms = await get_educator_classrooms("educator_alice")
-    print(f"   {classrooms}")
+    print(f"   {educator_classrooms}")
     
     # Test student classrooms
     print("\n2. Student 001's classrooms:")
-    classrooms = await get_student_classrooms("student_001")
-    print(f"   {classrooms}")
+    print(f"   {student_classrooms}")
     
     # Test student school
     print("\n3. Student 001's school:")
-    school = await get_student_school("student_001")
-    print(f"   {school}")
+    print(f"   {student_school}")
     
     # Test educator school
     print("\n4. Educator Alice's school:")
-    school = await get_educator_school("educator_alice")
-    print(f"   {school}")
+    print(f"   {educator_school}")
 
 
 async def test_access_control():
@@ -1,8 +1,9 @@
 import asyncio
 import sys
 import os
-from unittest.mock import MagicMock, patch
-from fastapi import HTTPException, Request
+from contextlib import ExitStack
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import BackgroundTasks, HTTPException, Request
 from datetime import datetime
 
 # Ensure app is in path
@@ -11,6 +12,15 @@ sys.path.append('c:/Users/ksank/Master-Chatbot')
 from app.routers.agent import ask_question
 from app.models.query_models import AskRequest
 from app.models.data_models import AssessmentDataSet, EMTRecord
+from app.services.data_router import DataRouter
+from app.services.llm_engine import LLMEngine
+
+# Valid mock dataset (avoids ZeroDivisionError), built once and shared by every case
+MOCK_DATASET = AssessmentDataSet(
+    emt_data=[EMTRecord(student_id="s1", assessment_date=datetime(2024, 1, 1), emotion_score=0.5, metadata={})],
+    real_data=[],
+    sel_data=[]
+)
 
 async def test_access_control():
     print("Running Data Access Control Tests...")
@@ -18,16 +28,25 @@ async def test_access_control():
     # Mock request object
     mock_request = MagicMock(spec=Request)
     mock_request.client.host = "127.0.0.1"
+    # The app builds these at startup (app.state); calling the endpoint directly skips Depends
+    services = {"data_router": DataRouter(), "llm_engine": LLMEngine()}
     
-    # Create a valid mock dataset to avoid ZeroDivisionError
-    mock_dataset = AssessmentDataSet()
-    mock_dataset.emt_data = [EMTRecord(student_id="s1", assessment_date=datetime.now(), emotion_score=0.5, metadata={})]
-    mock_dataset.real_data = []
-    mock_dataset.sel_data = []
-
-    # Mock side-effect services
-    with patch('app.routers.agent.audit_logger'), \
-         patch('app.routers.agent.harmful_content_detector') as mock_hcd:
+    # Patch every collaborator once for the whole run; cases only differ in user and question
+    with ExitStack() as stack:
+        stack.enter_context(patch('app.routers.agent.audit_logger'))
+        mock_hcd = stack.enter_context(patch('app.routers.agent.harmful_content_detector'))
+        stack.enter_context(patch(
+            'app.services.data_router.DataRouter.afetch_data',
+            new_callable=AsyncMock, return_value=MOCK_DATASET
+        ))
+        stack.enter_context(patch(
+            'app.routers.agent.verify_data_access',
+            new_callable=AsyncMock, return_value=True
+        ))
+        stack.enter_context(patch(
+            'app.services.llm_engine.LLMEngine.agenerate_response',
+            new_callable=AsyncMock, return_value="Mock"
+        ))
         
         # Configure HCD to return "safe" result
         mock_hcd.detect_harmful_content.return_value = {"is_harmful": False}
@@ -38,12 +57,7 @@ async def test_access_control():
         user_s1 = {"user_id": "u1", "school_id": "School 1", "role": "educator"}
         req_s1 = AskRequest(question="How did School 1 perform?")
         try:
-            with patch('app.services.data_router.DataRouter.fetch_data') as mock_fetch, \
-                 patch('app.middleware.data_access.verify_data_access', return_value=True), \
-                 patch('app.services.llm_engine.LLMEngine.generate_response', return_value="Mock"):
-                
-                mock_fetch.return_value = mock_dataset
-                await ask_question(mock_request, req_s1, user_s1)
+            await ask_question(mock_request, req_s1, BackgroundTasks(), user_s1, **services)
             print("PASS: Access allowed")
         except HTTPException as e:
             print(f"FAIL: {e.detail}")
@@ -52,11 +66,7 @@ async def test_access_control():
         print("\nTest 2: Invalid Access (School 1 -> School 2)")
         req_s2 = AskRequest(question="How did School 2 perform?")
         try:
-            with patch('app.services.data_router.DataRouter.fetch_data'), \
-                 patch('app.middleware.data_access.verify_data_access', return_value=True), \
-                 patch('app.services.llm_engine.LLMEngine.generate_response', return_value="Mock"):
-                 
-                await ask_question(mock_request, req_s2, user_s1)
+            await ask_question(mock_request, req_s2, BackgroundTasks(), user_s1, **services)
             print("FAIL: Access should have been denied")
         except HTTPException as e:
             if e.status_code == 403:
@@ -70,12 +80,7 @@ async def test_access_control():
         user_lincoln = {"user_id": "u2", "school_id": "Lincoln High School", "role": "educator"}
         req_lincoln = AskRequest(question="How did School Lincoln perform?")
         try:
-            with patch('app.services.data_router.DataRouter.fetch_data') as mock_fetch, \
-                 patch('app.middleware.data_access.verify_data_access', return_value=True), \
-                 patch('app.services.llm_engine.LLMEngine.generate_response', return_value="Mock"):
-                
-                mock_fetch.return_value = mock_dataset
-                await ask_question(mock_request, req_lincoln, user_lincoln)
+            await ask_question(mock_request, req_lincoln, BackgroundTasks(), user_lincoln, **services)
             print("PASS: Partial match allowed")
         except HTTPException as e:
             print(f"FAIL: Partial match denied: {e.detail}")
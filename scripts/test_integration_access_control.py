@@ -16,6 +16,18 @@ from app.middleware.data_access import (
 )
 
 
+# Access check for each scenario "kind"; called as handler(educator_id, target_id)
+HANDLERS = {
+    "student": check_educator_student_access,
+    "classroom": check_educator_classroom_access,
+}
+
+
+async def _run_scenario(scenario: dict) -> bool:
+    """Run the access check a scenario describes."""
+    return await HANDLERS[scenario["kind"]](scenario["educator"], scenario["target"])
+
+
 async def test_access_scenarios():
     """Test various access control scenarios."""
     print("\n" + "="*70)
@@ -27,35 +39,40 @@ async def test_access_scenarios():
         {
             "name": "Educator Alice → Student 001 (Same classroom)",
             "educator": "educator_alice",
-            "student": "student_001",
+            "kind": "student",
+            "target": "student_001",
             "expected": True,
             "description": "Should ALLOW - educator teaches this student"
         },
         {
             "name": "Educator Alice → Student 006 (Different classroom, same school)",
             "educator": "educator_alice",
-            "student": "student_006",
+            "kind": "student",
+            "target": "student_006",
             "expected": False,
             "description": "Should DENY - student in different classroom"
         },
         {
             "name": "Educator Alice → Student 011 (Different school)",
             "educator": "educator_alice",
-            "student": "student_011",
+            "kind": "student",
+            "target": "student_011",
             "expected": False,
             "description": "Should DENY - cross-school access"
         },
         {
             "name": "Educator Bob → Classroom 1B",
             "educator": "educator_bob",
-            "classroom": "classroom_1b",
+            "kind": "classroom",
+            "target": "classroom_1b",
             "expected": True,
             "description": "Should ALLOW - educator teaches this classroom"
         },
         {
             "name": "Educator Bob → Classroom 1A",
             "educator": "educator_bob",
-            "classroom": "classroom_1a",
+            "kind": "classroom",
+            "target": "classroom_1a",
             "expected": False,
             "description": "Should DENY - different classroom in same school"
         },
@@ -64,31 +81,24 @@ async def test_access_scenarios():
     passed = 0
     failed = 0
     
-    for i, scenario in enumerate(scenarios, 1):
+    # The checks are independent, so run them concurrently and report in order
+    results = await asyncio.gather(
+        *(_run_scenario(scenario) for scenario in scenarios),
+        return_exceptions=True
+    )
+    
+    for i, (scenario, result) in enumerate(zip(scenarios, results), 1):
         print(f"\n{i}. {scenario['name']}")
         print(f"   {scenario['description']}")
         
-        try:
-            if "student" in scenario:
-                result = await check_educator_student_access(
-                    scenario["educator"],
-                    scenario["student"]
-                )
-            elif "classroom" in scenario:
-                result = await check_educator_classroom_access(
-                    scenario["educator"],
-                    scenario["classroom"]
-                )
-            
-            if result == scenario["expected"]:
-                print(f"   ✅ PASS - Result: {result}")
-                passed += 1
-            else:
-                print(f"   ❌ FAIL - Expected: {scenario['expected']}, Got: {result}")
-                failed += 1
-                
-        except Exception as e:
-            print(f"   ❌ ERROR - {str(e)}")
+        if isinstance(result, Exception):
+            print(f"   ❌ ERROR - {str(result)}")
+            failed += 1
+        elif result == scenario["expected"]:
+            print(f"   ✅ PASS - Result: {result}")
+            passed += 1
+        else:
+            print(f"   ❌ FAIL - Expected: {scenario['expected']}, Got: {result}")
             failed += 1
     
     # Summary
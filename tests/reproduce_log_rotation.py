@@ -14,6 +14,7 @@ TEST_LOG_FILE = "tests/logs/audit_test.log"
 TEST_ARCHIVE_DIR = "tests/logs/archive"
 MAX_BYTES = 1024  # 1KB for testing
 BACKUP_COUNT = 5
+ARCHIVAL_TIMEOUT_SECONDS = 10
 
 def setup_test_env():
     """Clean up and recreate test directories."""
@@ -30,6 +31,33 @@ def setup_test_env():
     os.environ["AUDIT_LOG_TO_FILE"] = "true"
     os.environ["AUDIT_LOG_STDOUT"] = "false"
 
+def wait_for_archival(timeout=ARCHIVAL_TIMEOUT_SECONDS, interval=0.05):
+    """
+    Poll the archive dir until every rotated file is compressed and checksummed.
+    
+    The background thread writes file.gz, then file.gz.sha256, then removes the raw file,
+    so archival is done once only .gz/.sha256 pairs remain.
+    
+    Returns:
+        True if archival finished before the timeout
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        gz_count = sha_count = pending = 0
+        with os.scandir(TEST_ARCHIVE_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith(".gz"):
+                    gz_count += 1
+                elif entry.name.endswith(".sha256"):
+                    sha_count += 1
+                else:
+                    pending += 1
+        if gz_count > 0 and gz_count == sha_count and pending == 0:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
 def verify_rotation():
     print("Starting Log Rotation Verification...")
     setup_test_env()
@@ -39,22 +67,26 @@ def verify_rotation():
     # Generate enough logs to trigger rotation multiple times
     # Each log entry is roughly 200-300 bytes
     print("Generating logs...")
-    for i in range(50):
-        logger.log_data_access(
-            user_id=f"user_{i}",
-            user_email=f"user_{i}@example.com",
-            user_role="educator",
-            school_id="school_123",
-            action="view",
-            purpose="Testing log rotation",
-            student_id=f"student_{i}",
-            data_sources_accessed=["REAL"]
-        )
-        # Small sleep to ensure timestamps differ slightly if needed
-        # time.sleep(0.01)
+    logger.log_data_access_many(
+        {
+            "user_id": f"user_{i}",
+            "user_email": f"user_{i}@example.com",
+            "user_role": "educator",
+            "school_id": "school_123",
+            "action": "view",
+            "purpose": "Testing log rotation",
+            "student_id": f"student_{i}",
+            "data_sources_accessed": ["REAL"],
+        }
+        for i in range(50)
+    )
     
     print("Logs generated. Waiting for background threads to finish archival...")
-    time.sleep(2)  # Wait for async archival threads
+    started = time.monotonic()
+    if wait_for_archival():
+        print(f"Archival finished in {time.monotonic() - started:.2f}s")
+    else:
+        print(f"[WARN] Archival still running after {ARCHIVAL_TIMEOUT_SECONDS}s")
     
     # Check if active log exists
     if os.path.exists(TEST_LOG_FILE):
@@ -62,28 +94,34 @@ def verify_rotation():
     else:
         print(f"[FAIL] Active log file missing: {TEST_LOG_FILE}")
         
-    # Check for archived files
-    archives = os.listdir(TEST_ARCHIVE_DIR)
-    gz_files = [f for f in archives if f.endswith(".gz")]
-    sha_files = [f for f in archives if f.endswith(".sha256")]
+    # Check for archived files (one directory pass tallies both suffixes)
+    gz_count = 0
+    sha_count = 0
+    latest_gz = None
+    with os.scandir(TEST_ARCHIVE_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith(".gz"):
+                gz_count += 1
+                latest_gz = entry
+            elif entry.name.endswith(".sha256"):
+                sha_count += 1
     
-    print(f"Found {len(gz_files)} archived .gz files")
-    print(f"Found {len(sha_files)} checksum .sha256 files")
+    print(f"Found {gz_count} archived .gz files")
+    print(f"Found {sha_count} checksum .sha256 files")
     
-    if len(gz_files) > 0 and len(gz_files) == len(sha_files):
+    if gz_count > 0 and gz_count == sha_count:
         print("[OK] Archival and checksum generation successful")
     else:
         print("[FAIL] Archival failed or checksum mismatch")
         
     # Verify content of one archive
-    if gz_files:
+    if latest_gz is not None:
         import gzip
-        latest_gz = os.path.join(TEST_ARCHIVE_DIR, gz_files[-1])
         try:
-            with gzip.open(latest_gz, 'rt') as f:
+            with gzip.open(latest_gz.path, 'rt') as f:
                 content = f.read()
                 if "user_" in content:
-                    print(f"[OK] Verified content of archived log: {gz_files[-1]}")
+                    print(f"[OK] Verified content of archived log: {latest_gz.name}")
                 else:
                     print(f"[FAIL] Archived log content verification failed")
         except Exception as e:
@@ -1,9 +1,13 @@
 """
 Tests for the Master Agent service.
 """
+import asyncio
 import pytest
+from fastapi import BackgroundTasks, HTTPException, Request
 from fastapi.testclient import TestClient
 import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
 
 # Import the FastAPI app
 import sys
@@ -11,8 +15,13 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.main import app
+from app.models.chat_models import ChatRequest
+from app.models.query_models import AskRequest
+from app.routers import agent as agent_router, chat as chat_router
 from app.services.data_router import DataRouter
-from app.services.llm_engine import LLMEngine
+from app.services.llm_engine import ConcurrencyLimitedLLMEngine, LLMEngine
+from app.services.harmful_content_detector import HarmfulContentDetector
+from app.services.service_manager import ServiceState, get_service_manager
 
 
 client = TestClient(app)
@@ -95,6 +104,19 @@ def test_query_test_data_endpoint():
     assert "data_summary" in data
 
 
+def test_routers_use_app_state_services(monkeypatch):
+    """Test that the routers use the services built at startup instead of their own."""
+    class StubDataRouter:
+        def determine_data_sources(self, question):
+            return ["STUB"]
+    
+    monkeypatch.setattr(get_service_manager(), "_state", ServiceState.RUNNING)
+    monkeypatch.setattr(app.state, "data_router", StubDataRouter(), raising=False)
+    response = client.get("/query/sources", params={"question": "How are students doing?"})
+    assert response.status_code == 200
+    assert response.json()["data_sources"] == ["STUB"]
+
+
 def test_data_router_keyword_matching():
     """Test the data router's keyword matching logic."""
     router = DataRouter()
@@ -156,3 +178,137 @@ def test_llm_engine_response_generation():
     assert isinstance(response, str)
     assert len(response) > 0
 
+
+class _FakeGeminiModel:
+    """Stands in for a Gemini model; each call yields the next scripted outcome."""
+    
+    def __init__(self, outcome):
+        self.outcome = outcome
+    
+    def _respond(self):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return SimpleNamespace(text=self.outcome)
+    
+    def generate_content(self, prompt, generation_config=None):
+        return self._respond()
+    
+    async def generate_content_async(self, prompt, generation_config=None):
+        return self._respond()
+
+
+def test_llm_engine_sync_and_async_responses_match():
+    """Test that the sync and async LLM paths post-process every outcome the same way."""
+    question = "How are students doing?"
+    data_summary = {"emt_summary": {"record_count": 1, "average_score": 0.5}}
+    conversation = ["System: be helpful", "User: hi"]
+    mock_answer = LLMEngine()._mock_fallback(question, data_summary)
+    
+    for outcome, answer in (("  Gemini answer  ", "Gemini answer"), ("", mock_answer), (RuntimeError("boom"), mock_answer)):
+        engine = LLMEngine()
+        engine.model = _FakeGeminiModel(outcome)
+        engine.gemini_enabled = True
+        assert engine.generate_response(question, data_summary) == answer
+        assert asyncio.run(engine.agenerate_response(question, data_summary)) == answer
+        assert engine.generate_chat_response(conversation) == asyncio.run(
+            engine.agenerate_chat_response(conversation)
+        )
+
+
+def test_concurrency_limited_engine_bounds_in_flight_calls():
+    """Test that the concurrency-limited engine caps in-flight calls for /ask and /chat."""
+    class SlowEngine:
+        def __init__(self):
+            self.in_flight = self.max_in_flight = 0
+        
+        async def _call(self, result):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            return result
+        
+        async def agenerate_response(self, question, data_summary, max_tokens=500):
+            return await self._call(question)
+        
+        async def agenerate_chat_response(self, conversation, max_tokens=500, system_instruction=None):
+            return await self._call(conversation[-1])
+    
+    async def run(engine):
+        return await asyncio.gather(
+            *(engine.agenerate_response(f"q{i}", {}) for i in range(5)),
+            *(engine.agenerate_chat_response([f"c{i}"]) for i in range(5)),
+        )
+    
+    slow = SlowEngine()
+    results = asyncio.run(run(ConcurrencyLimitedLLMEngine(slow, max_concurrency=2)))
+    assert results == [f"q{i}" for i in range(5)] + [f"c{i}" for i in range(5)]
+    assert slow.max_in_flight == 2
+
+
+# A harmful match that is audited but not severe enough to block the request
+_ALLOWED_HARM = {"is_harmful": True, "severity": "medium", "harm_types": ["self_harm"], "matches": ["sad"]}
+
+
+def _mock_request():
+    request = MagicMock(spec=Request)
+    request.client.host = "127.0.0.1"
+    return request
+
+
+def test_question_harm_audit_survives_access_denied():
+    """Test that the question's harmful-content audit is written even if access is then denied."""
+    background_tasks = BackgroundTasks()
+    with patch.object(agent_router, "audit_logger") as audit_logger, \
+            patch.object(agent_router, "harmful_content_detector") as detector, \
+            patch.object(agent_router, "verify_data_access", new_callable=AsyncMock,
+                         side_effect=HTTPException(status_code=403, detail="Access denied")):
+        detector.detect_harmful_content.return_value = _ALLOWED_HARM
+        detector.should_block_response.return_value = False
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(agent_router.ask_question(
+                _mock_request(), AskRequest(question="My student feels sad", student_id="student_001"),
+                background_tasks, {"user_id": "u1", "role": "educator"},
+                data_router=DataRouter(), llm_engine=LLMEngine()
+            ))
+    
+    assert excinfo.value.status_code == 403
+    audit_logger.log_harmful_content.assert_called_once()
+    assert audit_logger.log_harmful_content.call_args.kwargs["context"] == "question"
+    assert not background_tasks.tasks  # Nothing left that an error response would drop
+
+
+def test_chat_message_harm_audit_survives_llm_failure():
+    """Test that the chat message's harmful-content audit is written even if the reply fails."""
+    llm_engine = MagicMock()
+    llm_engine.agenerate_chat_response = AsyncMock(side_effect=RuntimeError("LLM down"))
+    with patch.object(chat_router, "audit_logger") as audit_logger, \
+            patch.object(chat_router, "harmful_content_detector") as detector:
+        detector.detect_harmful_content.return_value = _ALLOWED_HARM
+        detector.should_block_response.return_value = False
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(chat_router.chat(
+                _mock_request(), ChatRequest(message="My student feels sad"),
+                BackgroundTasks(), {"user_id": "u1", "role": "educator"},
+                llm_engine=llm_engine
+            ))
+    
+    assert excinfo.value.status_code == 500
+    audit_logger.log_harmful_content.assert_called_once()
+    assert audit_logger.log_harmful_content.call_args.kwargs["context"] == "chat_message"
+
+
+def test_harmful_content_batch_matches_single_scans():
+    """Test that a batched scan returns the same results as per-text scans."""
+    detector = HarmfulContentDetector(enabled=True)
+    texts = ["I want to kill myself", "How are students doing?", ""]
+    contexts = ["question", "response", "response"]
+    
+    results = detector.detect_harmful_content_batch(texts, contexts)
+    
+    assert results == [
+        detector.detect_harmful_content(text, context=context)
+        for text, context in zip(texts, contexts)
+    ]
+    assert results[0]["severity"] == "critical"
+    assert not results[1]["is_harmful"]
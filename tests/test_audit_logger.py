@@ -0,0 +1,72 @@
+"""
+Tests for the FERPA Audit Logger file handling
+"""
+import json
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import audit_logger
+from app.services.audit_logger import ArchivingAuditHandler, AuditConfig, FERPAAuditLogger
+
+
+@pytest.fixture
+def audit_env(tmp_path, monkeypatch):
+    """Send audit logs to a temporary directory with no stdout or external sinks."""
+    monkeypatch.setenv("AUDIT_LOG_FILE", str(tmp_path / "audit.log"))
+    monkeypatch.setenv("AUDIT_ARCHIVE_DIR", str(tmp_path / "archive"))
+    monkeypatch.setenv("AUDIT_LOG_STDOUT", "false")
+    monkeypatch.setenv("AUDIT_SINKS", "")
+    monkeypatch.delenv("AUDIT_LOG_PER_PROCESS", raising=False)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.setattr(audit_logger, "_file_handlers", {})
+    # Loggers share the "audit_logger" logging.Logger; give the app's handlers back afterwards
+    monkeypatch.setattr(logging.getLogger("audit_logger"), "handlers", [])
+    yield tmp_path
+    for handler in audit_logger._file_handlers.values():
+        handler.close()
+
+
+def test_loggers_share_one_handler_per_file(audit_env):
+    """Test that every logger in a process writes a file through the same handler."""
+    first = FERPAAuditLogger(enabled=True)
+    second = FERPAAuditLogger(enabled=True)
+    assert first._file_handler is second._file_handler
+
+    first.log_data_access(user_id="u1", user_email="u1@example.org", user_role="educator",
+                          school_id="School 1", action="query", purpose="test")
+    second.log_data_access_many([
+        {"user_id": "u2", "user_email": "u2@example.org", "user_role": "educator",
+         "school_id": "School 1", "action": "query", "purpose": "test"},
+    ])
+    lines = (audit_env / "audit.log").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["user_id"] for line in lines] == ["u1", "u2"]
+
+
+def test_per_process_files_default_to_multi_worker(audit_env, monkeypatch):
+    """Test that per-process audit files are enabled whenever there is more than one worker."""
+    assert AuditConfig.from_env().per_process_files is False
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    assert AuditConfig.from_env().per_process_files is True
+    monkeypatch.setenv("AUDIT_LOG_PER_PROCESS", "false")
+    assert AuditConfig.from_env().per_process_files is False
+
+
+def test_per_process_handler_switches_files_after_fork(audit_env, monkeypatch):
+    """Test that a forked worker stops appending to its parent's audit file."""
+    log_file = str(audit_env / "audit.log")
+    monkeypatch.setattr(audit_logger.os, "getpid", lambda: 100)
+    handler = ArchivingAuditHandler(log_file, encoding="utf-8", per_process=True)
+    handler.emit_many(["parent"])
+
+    monkeypatch.setattr(audit_logger.os, "getpid", lambda: 200)
+    handler.emit_many(["child"])
+    handler.close()
+
+    assert (audit_env / "audit.100.log").read_text(encoding="utf-8").split() == ["parent"]
+    assert (audit_env / "audit.200.log").read_text(encoding="utf-8").split() == ["child"]
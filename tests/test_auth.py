@@ -0,0 +1,109 @@
+"""
+Tests for the verified-token cache in the Authentication Middleware
+"""
+import asyncio
+import dataclasses
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from cachetools import TTLCache
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.middleware import auth
+
+
+class _Clock:
+    """Manually advanced clock for the token cache's TTL."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Require local HS256 auth and give the token cache a fresh, controllable clock."""
+    clock = _Clock()
+    monkeypatch.setattr(auth, "settings", dataclasses.replace(
+        auth.settings, require_auth=True, auth0_enabled=False
+    ))
+    monkeypatch.setattr(auth, "_verified_token_cache", TTLCache(
+        maxsize=100, ttl=auth.VERIFIED_TOKEN_CACHE_TTL_SECONDS, timer=clock
+    ))
+    return clock
+
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    """Count full signature verifications (cache misses)."""
+    calls = []
+    decode = auth.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", counting_decode)
+    return calls
+
+
+def _token(user_id: str, expires_in: int) -> str:
+    payload = {"sub": user_id, "role": "educator", "exp": int(time.time()) + expires_in}
+    return auth.jwt.encode(payload, auth.settings.jwt_secret_key, algorithm=auth.ALGORITHM)
+
+
+def _verify(token: str) -> dict:
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return asyncio.run(auth.verify_token(credentials))
+
+
+def test_verified_token_is_cached(clock, decode_calls):
+    """Test that a repeat request with the same token skips signature verification."""
+    token = _token("alice", expires_in=3600)
+    assert _verify(token)["user_id"] == "alice"
+    assert _verify(token)["user_id"] == "alice"
+    assert len(decode_calls) == 1
+
+
+def test_hash_collision_is_rejected_by_full_token_compare(clock, decode_calls, monkeypatch):
+    """Test that a token whose hash collides with a cached one is verified on its own."""
+    monkeypatch.setattr(auth, "_token_cache_key", lambda token: 1)
+    alice = _token("alice", expires_in=3600)
+    assert _verify(alice)["user_id"] == "alice"
+
+    # A different valid token with the same cache key gets its own identity
+    assert _verify(_token("bob", expires_in=3600))["user_id"] == "bob"
+
+    # A forged token with the same cache key is rejected, not served alice's entry
+    with pytest.raises(HTTPException) as excinfo:
+        _verify(alice[:-2] + ("AA" if not alice.endswith("AA") else "BB"))
+    assert excinfo.value.status_code == 401
+    assert len(decode_calls) == 3
+
+
+def test_token_expiring_within_ttl_is_not_cached(clock, decode_calls):
+    """Test that a token which expires before the cache entry would is never cached."""
+    token = _token("alice", expires_in=auth.VERIFIED_TOKEN_CACHE_TTL_SECONDS - 10)
+    _verify(token)
+    assert len(auth._verified_token_cache) == 0
+    _verify(token)
+    assert len(decode_calls) == 2
+
+
+def test_cached_token_is_not_served_after_exp(clock, decode_calls):
+    """Test that a cached entry is gone by the time its token expires."""
+    expires_in = auth.VERIFIED_TOKEN_CACHE_TTL_SECONDS + 1
+    token = _token("alice", expires_in=expires_in)
+    _verify(token)
+    assert len(auth._verified_token_cache) == 1
+
+    clock.now += expires_in
+    assert auth._get_verified_token(auth._token_cache_key(token), token) is None
@@ -1,6 +1,7 @@
 """
 Tests for CSV Data Service
 """
+import os
 import pytest
 import sys
 from pathlib import Path
@@ -49,3 +50,51 @@ def test_compute_prepost_comparison():
     assert result["metrics"]["metric_a"]["pre"] == 5
     assert result["metrics"]["metric_a"]["post"] == 8
     assert result["metrics"]["metric_a"]["delta"] == 3
+
+
+def test_columnar_comparison_matches_row_comparison():
+    """Test that the columnar pre/post comparison matches the row-based one."""
+    rows = csv_data.load_scores()
+    
+    for grade in (None, "Grade 1", "grade 1", "Grade 9"):
+        expected = csv_data.compute_prepost_comparison(csv_data.filter_records(rows, grade=grade))
+        assert csv_data.prepost_comparison(grade=grade) == expected
+
+
+def test_parsed_scores_sidecar_roundtrip(tmp_path):
+    """Test that a fresh sidecar is reused and a stale one is ignored."""
+    source = Path(csv_data.DATA_DIR) / csv_data.DEFAULT_FILE_NAME
+    file_path = tmp_path / "scores.csv"
+    file_path.write_bytes(source.read_bytes())
+    sidecar_path = str(file_path) + csv_data._SIDECAR_SUFFIX
+    
+    parsed = csv_data._read_csv(str(file_path))
+    csv_data._write_sidecar(sidecar_path, parsed)
+    assert csv_data._read_sidecar(str(file_path), sidecar_path) == parsed
+    
+    # Touch the CSV so it is newer than the sidecar
+    future = Path(sidecar_path).stat().st_mtime + 10
+    os.utime(file_path, (future, future))
+    assert csv_data._read_sidecar(str(file_path), sidecar_path) is None
+
+
+def test_scores_file_must_be_a_csv_inside_data_dir():
+    """Test that file names resolving outside DATA_DIR are rejected before any read or write."""
+    for file_name in ("/etc/passwd", "../requirements.txt", "access_control.db"):
+        with pytest.raises(csv_data.InvalidDataFileError):
+            csv_data.load_scores(file_name=file_name)
+    with pytest.raises(FileNotFoundError):
+        csv_data.load_scores(file_name="missing_export.csv")
+    assert not os.path.exists("/etc/passwd" + csv_data._SIDECAR_SUFFIX)
+
+
+def test_columnar_summaries_match_row_summaries():
+    """Test that prepost_summaries() matches the row-based summary helpers."""
+    for grade in ("Grade 1", "grade 1", "Grade 9"):
+        pre_rows = csv_data.filter_scores(grade=grade, test_type="pre")
+        post_rows = csv_data.filter_scores(grade=grade, test_type="post")
+        result = csv_data.prepost_summaries(grade=grade)
+        assert result["counts"] == {"rows_pre": len(pre_rows), "rows_post": len(post_rows)}
+        assert result["pre"] == csv_data.summarize_rows(pre_rows)
+        assert result["post"] == csv_data.summarize_rows(post_rows)
+        assert result["comparison"] == csv_data.build_comparison_summary(pre_rows, post_rows)
@@ -0,0 +1,122 @@
+"""
+Tests for the Database Service roster cache
+"""
+import asyncio
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import database
+from app.services.service_manager import ServiceState, get_service_manager
+
+
+@pytest.fixture
+def roster_db(tmp_path, monkeypatch):
+    """Point the database service at an empty, freshly initialized database."""
+    db_path = str(tmp_path / "access_control.db")
+    monkeypatch.setattr(database, "DB_PATH", db_path)
+    monkeypatch.setattr(database, "_local", threading.local())  # Drop per-thread connections
+    monkeypatch.setattr(database, "_access_cache_version", None)
+    monkeypatch.setattr(database, "_access_cache_checked_at", None)
+    database._access_cache.clear()
+    database.init_database()
+    database.add_many_educator_classrooms([("educator_alice", "class_1", "school_1", "teacher")])
+    database.add_many_student_classrooms([("student_001", "class_1", "school_1")])
+    yield db_path
+    database._access_cache.clear()
+
+
+@pytest.fixture
+def query_counter(monkeypatch):
+    """Count the roster queries that reach SQLite."""
+    calls = []
+    select_context = database._select_context
+
+    def counting_select_context(*args):
+        calls.append(args)
+        return select_context(*args)
+
+    monkeypatch.setattr(database, "_select_context", counting_select_context)
+    return calls
+
+
+def test_context_lookup_is_cached(roster_db, query_counter):
+    """Test that repeated lookups are served from the cache."""
+    first = asyncio.run(database.get_educator_context("educator_alice"))
+    second = asyncio.run(database.get_educator_context("educator_alice"))
+    assert first == second == {"school_id": "school_1", "classroom_ids": ["class_1"]}
+    assert len(query_counter) == 1
+
+
+def test_cache_hit_makes_no_sqlite_call(roster_db, monkeypatch):
+    """Test that a lookup answered by the cache does not touch SQLite, on the loop or off it."""
+    async def lookups():
+        await database.get_educator_context("educator_alice")
+        calls = []
+        get_db_connection = database.get_db_connection
+
+        def recording_get_db_connection():
+            calls.append(threading.current_thread().name)
+            return get_db_connection()
+
+        monkeypatch.setattr(database, "get_db_connection", recording_get_db_connection)
+        await database.get_educator_context("educator_alice")
+        await database.get_access_context("educator_alice", "student_001")  # Student side misses
+        return calls
+
+    calls = asyncio.run(lookups())
+    # Only the student miss reaches SQLite, and it runs in a worker thread
+    assert len(calls) == 1
+    assert threading.main_thread().name not in calls
+
+
+def test_add_many_invalidates_cached_lookups(roster_db, query_counter):
+    """Test that roster writes through the helpers are visible immediately."""
+    asyncio.run(database.get_educator_context("educator_alice"))
+    database.add_many_educator_classrooms([("educator_alice", "class_2", "school_1", "teacher")])
+    context = asyncio.run(database.get_educator_context("educator_alice"))
+    assert context["classroom_ids"] == ["class_1", "class_2"]
+    assert len(query_counter) == 2
+
+
+def test_write_from_another_connection_invalidates_cached_lookups(roster_db, monkeypatch):
+    """Test that a revocation made outside this process is not served after the next version check."""
+    educator, student = asyncio.run(database.get_access_context("educator_alice", "student_001"))
+    assert educator["classroom_ids"] == student["classroom_ids"] == ["class_1"]
+
+    # A separate connection stands in for another worker or an admin tool
+    conn = sqlite3.connect(roster_db)
+    conn.execute("DELETE FROM student_classrooms WHERE student_id = ?", ("student_001",))
+    conn.commit()
+    conn.close()
+
+    # Within the check interval the cached entry may still be served; past it, never
+    last_check = time.monotonic() - database.ROSTER_VERSION_CHECK_SECONDS
+    monkeypatch.setattr(database, "_access_cache_checked_at", last_check)
+    _, student = asyncio.run(database.get_access_context("educator_alice", "student_001"))
+    assert student == {"school_id": None, "classroom_ids": []}
+
+
+def test_invalidate_endpoint_bumps_shared_version(roster_db, monkeypatch):
+    """Test that POST /admin/cache/invalidate invalidates every worker's cache."""
+    from app.main import app
+
+    monkeypatch.setattr(get_service_manager(), "_state", ServiceState.RUNNING)
+    asyncio.run(database.get_educator_context("educator_alice"))
+    version = database._access_cache_version
+
+    response = TestClient(app).post("/admin/cache/invalidate")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok", "entries_removed": 1}
+
+    conn = sqlite3.connect(roster_db)
+    assert conn.execute("SELECT version FROM roster_version").fetchone()[0] == version + 1
+    conn.close()